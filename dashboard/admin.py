@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ProfileCurve
+
+
+@admin.register(ProfileCurve)
+class ProfileCurveAdmin(admin.ModelAdmin):
+    list_display = ('library', 'etch_ion_flux', 'etch_neu_flux', 'dep_ion_flux', 'dep_neu_flux', 'n_cycles',
+                    'depth', 'num_points')
+    list_filter = ('library',)
+    exclude = ('points',)
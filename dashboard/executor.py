@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    """
+    Raised when a job is submitted while the executor's queue is full.
+    """
+
+
+class BoundedExecutor:
+    """
+    Thread pool that runs at most max_workers jobs at once and holds at most
+    max_queue more waiting for a worker. Submitting beyond that raises
+    Overloaded immediately instead of queueing without bound. Jobs run in a
+    copy of the submitter's context, so stage timings reach its recording.
+
+    Args:
+        max_workers (int): Number of worker threads.
+        max_queue (int): Number of jobs allowed to wait for a worker.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dashboard")
+        self._lock = threading.Lock()
+        self.pending = 0
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                raise Overloaded(f"{self.pending} jobs already pending")
+            self.pending += 1
+        try:
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs fn in the pool and awaits its result.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the process-wide executor configured by DASHBOARD_MAX_CONCURRENCY
+    and DASHBOARD_MAX_QUEUE.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor(settings.DASHBOARD_MAX_CONCURRENCY, settings.DASHBOARD_MAX_QUEUE)
+        return _executor
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from curve_resample import RESAMPLE_POINTS
+from profile_store import MAX_COMPRESSION_ERROR, convert_json_db
+
+
+class Command(BaseCommand):
+    help = "Converts JSON profile databases into memory-mapped binary profile stores."
+
+    def add_arguments(self, parser):
+        parser.add_argument("json_files", nargs="+")
+        parser.add_argument("--output", help="Output path (only with a single input file).")
+        parser.add_argument("--dtype", choices=["float32", "float64"], default="float64")
+        parser.add_argument("--points", type=int, default=RESAMPLE_POINTS,
+                            help="Number of points every curve is resampled to, 0 keeps the points as they are.")
+        parser.add_argument("--top-k", type=int, default=0,
+                            help="Number of cosine coefficients stored per curve, 0 stores all the Fourier "
+                                 "coefficients.")
+        parser.add_argument("--max-error", type=float, default=MAX_COMPRESSION_ERROR,
+                            help="Largest relative reconstruction error accepted with --top-k, see "
+                                 "spectral_report. The dashboard serves the store like any other.")
+
+    def handle(self, *args, **options):
+        json_files = options["json_files"]
+        if options["output"] and len(json_files) > 1:
+            self.stderr.write("--output can only be used with a single input file.")
+            return
+        for json_file in json_files:
+            try:
+                out_path = convert_json_db(json_file, options["output"], options["dtype"],
+                                           num_points=options["points"] or None, top_k=options["top_k"] or None,
+                                           max_error=options["max_error"])
+            except ValueError as e:
+                raise CommandError(f"{json_file}: {e}")
+            self.stdout.write(f"Wrote {out_path}")
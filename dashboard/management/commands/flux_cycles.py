@@ -0,0 +1,27 @@
+import csv
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from flux_stream import CHUNK_SIZE, CycleStats, iter_cycles, iter_flux_chunks
+
+
+class Command(BaseCommand):
+    help = ("Streams a flux recording and writes per-cycle statistics as CSV, "
+            "without loading the recording into memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file", nargs="?", default=os.path.join(settings.BASE_DIR, "data", "etchingdata.csv"))
+        parser.add_argument("--rows", type=int, nargs=2, default=[0, 4], help="Range of the rows to average.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--time-step", type=float, default=250, help="Spacing between samples in ms.")
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options["csv_file"]):
+            raise CommandError(f"Flux recording {options['csv_file']} not found.")
+        writer = csv.writer(self.stdout)
+        writer.writerow(CycleStats._fields)
+        chunks = iter_flux_chunks(options["csv_file"], options["rows"], options["chunk_size"])
+        for cycle in iter_cycles(chunks, time_step=options["time_step"]):
+            writer.writerow(cycle)
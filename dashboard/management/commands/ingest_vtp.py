@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profile_store import convert_json_db
+from vtp_ingest import ingest_vtp_files
+
+
+class Command(BaseCommand):
+    help = "Ingests simulation outputs (.vtp files or directories of them) into a profile database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+")
+        parser.add_argument("--db", required=True, help="JSON profile database to create or update.")
+        parser.add_argument("--manifest", help='JSON file mapping file names to keys, e.g. {"run_4.vtp": "3_0.5_0_0_4"}.')
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--flush-every", type=int, default=50)
+        parser.add_argument("--binary", action="store_true", help="Also write the memory-mapped binary store.")
+
+    def handle(self, *args, **options):
+        manifest = None
+        if options["manifest"]:
+            with open(options["manifest"]) as f:
+                manifest = json.load(f)
+        if options["flush_every"] < 1:
+            raise CommandError("--flush-every must be at least 1.")
+
+        def progress(done, total, key):
+            self.stdout.write(f"[{done}/{total}] {key}")
+
+        count = ingest_vtp_files(options["paths"], options["db"], manifest, options["workers"],
+                                 options["flush_every"], progress)
+        self.stdout.write(f"Ingested {count} profiles into {options['db']}")
+        if options["binary"]:
+            self.stdout.write(f"Wrote {convert_json_db(options['db'])}")
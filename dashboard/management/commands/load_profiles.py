@@ -0,0 +1,54 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dashboard.models import ProfileCurve
+from etchingsim import parse_key
+
+
+def profile_curves(library, data):
+    """
+    Yields unsaved ProfileCurve rows for the entries of a JSON profile
+    database, skipping keys that are not profile keys.
+    """
+    for key, entry in data.items():
+        params = parse_key(key)
+        if params is None:
+            continue
+        etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles = params
+        yield ProfileCurve(library=library, etch_ion_flux=etch_ion_flux, etch_neu_flux=etch_neu_flux,
+                           dep_ion_flux=dep_ion_flux, dep_neu_flux=dep_neu_flux, n_cycles=n_cycles,
+                           depth=entry.get("depth", 0.0), num_points=len(entry["points"]),
+                           points=ProfileCurve.encode_points(entry["points"]))
+
+
+class Command(BaseCommand):
+    help = "Loads JSON profile databases into the ProfileCurve table, one row per curve."
+
+    def add_arguments(self, parser):
+        parser.add_argument("json_files", nargs="+")
+        parser.add_argument("--library", help="Library name (only with a single input file), "
+                                              "defaults to the file name without its extension.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        json_files = options["json_files"]
+        if options["library"] and len(json_files) > 1:
+            raise CommandError("--library can only be used with a single input file.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        for json_file in json_files:
+            library = options["library"] or os.path.splitext(os.path.basename(json_file))[0]
+            with open(json_file) as f:
+                data = json.load(f)
+            curves = list(profile_curves(library, data))
+            # Replace the library as a whole so readers never see a partial load
+            with transaction.atomic():
+                ProfileCurve.objects.filter(library=library).delete()
+                ProfileCurve.objects.bulk_create(curves, batch_size=options["batch_size"])
+            skipped = len(data) - len(curves)
+            self.stdout.write(f"Loaded {len(curves)} curves into library {library}"
+                              + (f", skipped {skipped} invalid keys" if skipped else ""))
@@ -0,0 +1,138 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.operating_points import (CALLIBRATED_DEPTH, ETCHING_ONLY_WINDOW, RANGE_LIMIT, operating_point,
+                                        render_cache, render_key)
+from etchingsim import RENDERER_VERSION
+from profile_db import write_json_atomic
+from render_pool import RenderJob, _init_worker, _render_job
+
+MODES = {"deposition": False, "etching-only": True}
+
+
+def slider_windows(step, etching_only):
+    """
+    Yields the (start_range, end_range) windows the dashboard sliders can
+    select, on a step of the given number of samples. Without deposition
+    the end slider only spans ETCHING_ONLY_WINDOW samples, so the step of
+    the end is capped to it.
+    """
+    end_step = min(step, ETCHING_ONLY_WINDOW) if etching_only else step
+    for start in range(0, RANGE_LIMIT + 1, step):
+        max_limit = start + ETCHING_ONLY_WINDOW if etching_only else RANGE_LIMIT
+        for end in range(start + end_step, max_limit + 1, end_step):
+            yield start, end
+
+
+class Command(BaseCommand):
+    help = ("Renders the profiles of every dashboard operating point on a grid of slider positions into the "
+            "render cache and writes a manifest of them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--step", type=int, default=100, help="Slider step of the range ends, in samples.")
+        parser.add_argument("--neutral-flux", default="500",
+                            help="Comma separated neutral particle fluxes to render.")
+        parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Number of render processes, 0 renders in this process.")
+        parser.add_argument("--manifest", default=os.path.join(settings.MEDIA_ROOT, "prerender_manifest.json"))
+        parser.add_argument("--force", action="store_true", help="Render points that are already cached again.")
+
+    def _points(self, options):
+        """
+        Returns the operating points of the grid by render key, the same
+        point reached from several slider positions being rendered once.
+        """
+        cache = render_cache()
+        neutral_fluxes = [float(value) for value in options["neutral_flux"].split(",")]
+        modes = MODES if options["mode"] == "both" else {options["mode"]: MODES[options["mode"]]}
+        points = {}
+        for mode, etching_only in modes.items():
+            mode_params = {"no_deposition": "on"} if etching_only else {}
+            profile_db_path = operating_point(mode_params)["profile_db_path"]
+            if not os.path.exists(profile_db_path):
+                self.stderr.write(f"Skipping {mode}, profile database {profile_db_path} not found.")
+                continue
+            for neutral_flux in neutral_fluxes:
+                for start, end in slider_windows(options["step"], etching_only):
+                    params = dict(mode_params, start_range=start, end_range=end, neutral_particle_flux=neutral_flux)
+                    point = operating_point(params)
+                    key = render_key(cache, point)
+                    if key not in points:
+                        points[key] = (point, [])
+                    points[key][1].append(params)
+        return points
+
+    def _render(self, jobs, workers):
+        """
+        Yields (key, depth, svg) for the {key: RenderJob} jobs as they finish.
+        """
+        db_paths = sorted({job.db_path for job in jobs.values()})
+        if not workers:
+            _init_worker(db_paths)
+            for key, job in jobs.items():
+                yield (key, *_render_job(job))
+            return
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_paths,)) as executor:
+            futures = {executor.submit(_render_job, job): key for key, job in jobs.items()}
+            for future in as_completed(futures):
+                yield (futures[future], *future.result())
+
+    def handle(self, *args, **options):
+        if options["step"] < 1:
+            raise CommandError("--step must be at least 1.")
+        if options["workers"] < 0:
+            raise CommandError("--workers must not be negative.")
+
+        start = time.perf_counter()
+        cache = render_cache()
+        points = self._points(options)
+        metas = {} if options["force"] else {key: cache.get(key) for key in points}
+        jobs = {
+            key: RenderJob(point["etch_ion_flux"], point["etch_neu_flux"], point["dep_ion_flux"],
+                           point["dep_neu_flux"], point["n_cycles"], point["profile_db_path"],
+                           tuple(point["etching_limits"]))
+            for key, (point, _) in points.items() if metas.get(key) is None
+        }
+        self.stdout.write(f"{len(points)} operating points, {len(points) - len(jobs)} already rendered, "
+                          f"rendering {len(jobs)}")
+
+        for done, (key, depth, svg) in enumerate(self._render(jobs, options["workers"]), 1):
+            def write(svg_path, svg=svg, depth=depth):
+                with open(svg_path, "wb") as f:
+                    f.write(svg)
+                return {"depth": depth}
+
+            metas[key] = cache.render(key, write)
+            if done % 100 == 0 or done == len(jobs):
+                self.stdout.write(f"[{done}/{len(jobs)}]")
+
+        manifest = {
+            "created": time.time(),
+            "renderer_version": RENDERER_VERSION,
+            "render_dir": cache.root,
+            "renders": [
+                {
+                    "key": key,
+                    "image": cache.filename(key),
+                    "depth": metas[key]["depth"],
+                    "actual_depth": CALLIBRATED_DEPTH * metas[key]["depth"],
+                    "params": params,
+                }
+                for key, (_, params) in points.items()
+            ],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(options["manifest"])), exist_ok=True)
+        write_json_atomic(options["manifest"], manifest)
+
+        # Renders beyond RENDER_CACHE_MAX_BYTES are evicted as the cache fills up
+        missing = sum(not os.path.exists(cache.path(key)) for key in points)
+        if missing:
+            self.stderr.write(self.style.WARNING(
+                f"{missing} renders were evicted, raise RENDER_CACHE_MAX_BYTES to keep the whole grid."))
+        self.stdout.write(f"Prerendered {len(points)} operating points in {time.perf_counter() - start:.2f} s, "
+                          f"wrote {options['manifest']}")
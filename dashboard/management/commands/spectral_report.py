@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from curve_resample import RESAMPLE_POINTS
+from etchingsim import SpectralLibrary, compression_report, load_profile_db
+
+
+class Command(BaseCommand):
+    help = ("Reports the reconstruction error and storage size of profile databases when only the top-k Fourier "
+            "coefficients of each curve are kept.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("db_files", nargs="+")
+        parser.add_argument("--top-k", default="5,10,20,50,100,200",
+                            help="Comma separated numbers of coefficients to try.")
+        parser.add_argument("--points", type=int, default=RESAMPLE_POINTS,
+                            help="Number of points every curve is resampled to.")
+
+    def handle(self, *args, **options):
+        try:
+            top_ks = [int(value) for value in options["top_k"].split(",")]
+        except ValueError:
+            raise CommandError("--top-k must be comma separated integers.")
+        if min(top_ks) < 1 or options["points"] < 1:
+            raise CommandError("--top-k and --points must be at least 1.")
+
+        for db_file in options["db_files"]:
+            spectra = SpectralLibrary.from_profiles(load_profile_db(db_file), options["points"])
+            self.stdout.write(f"{db_file}: {len(spectra.keys)} curves, {spectra.nbytes} bytes uncompressed")
+            self.stdout.write(f"{'top_k':>6} {'bytes':>10} {'ratio':>7} {'rms_error':>10} {'max_error':>10} "
+                              f"{'relative':>9}")
+            for row in compression_report(spectra, top_ks):
+                self.stdout.write(f"{row['top_k']:>6} {row['bytes']:>10} {row['ratio']:>7.3f} "
+                                  f"{row['rms_error']:>10.4g} {row['max_error']:>10.4g} "
+                                  f"{row['relative_error']:>9.2e}")
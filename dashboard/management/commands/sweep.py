@@ -0,0 +1,54 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from etchingsim import (etching_profile_batch, load_profile_db, load_profile_grid, load_spectra, parameter_grid,
+                        predictive_depth_batch)
+
+
+def parse_axis(value):
+    """
+    Parses an axis given as "start:stop:num" or as comma separated values.
+    """
+    if ":" in value:
+        start, stop, num = value.split(":")
+        return np.linspace(float(start), float(stop), int(num))
+    return np.array([float(v) for v in value.split(",")])
+
+
+class Command(BaseCommand):
+    help = "Evaluates depths (and optionally profiles) over a grid of operating points."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--etch-ion-flux", type=parse_axis, required=True,
+                            help='Etch ion flux axis, "start:stop:num" or "a,b,c".')
+        parser.add_argument("--etch-neu-flux", type=parse_axis, required=True)
+        parser.add_argument("--dep-ion-flux", type=parse_axis, default=np.array([3.0]))
+        parser.add_argument("--dep-neu-flux", type=parse_axis, default=np.array([2.0]))
+        parser.add_argument("--n-cycles", type=parse_axis, required=True)
+        parser.add_argument("--db", default=os.path.join(settings.BASE_DIR, "data", "etching_db_new.json"),
+                            help="Profile database to blend from.")
+        parser.add_argument("--curves", action="store_true", help="Also compute the stacked profiles.")
+        parser.add_argument("--output", default="sweep.npz")
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options["db"]):
+            raise CommandError(f"Profile database {options['db']} not found.")
+
+        start = time.perf_counter()
+        grid = parameter_grid(options["etch_ion_flux"], options["etch_neu_flux"], options["dep_ion_flux"],
+                              options["dep_neu_flux"], options["n_cycles"])
+        data = load_profile_db(options["db"])
+        spectra = load_spectra(options["db"]) if options["curves"] else None
+        depth, profiles = etching_profile_batch(*grid.values(), data, None, spectra,
+                                                with_curves=options["curves"], grid=load_profile_grid(options["db"]))
+        results = dict(grid, depth=depth, predicted_depth=predictive_depth_batch(*grid.values()))
+        if profiles is not None:
+            results["profiles"] = profiles
+        np.savez(options["output"], **results)
+
+        self.stdout.write(f"Evaluated {len(depth)} operating points in {time.perf_counter() - start:.2f} s, "
+                          f"wrote {options['output']}")
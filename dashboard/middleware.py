@@ -0,0 +1,59 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from etchingsim import timing
+
+logger = logging.getLogger('dashboard.timing')
+
+
+class TimingMiddleware:
+    """
+    Records the etchingsim and view stages run while handling a request.
+
+    The stage durations are returned in a Server-Timing header and logged as
+    one JSON line per request on the dashboard.timing logger. With
+    TIMING_ENABLED off the middleware removes itself and stage timing is
+    disabled process-wide.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        timing.enable(settings.TIMING_ENABLED)
+        if not settings.TIMING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with timing.record() as timings:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            return self._finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        with timing.record() as timings:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            return self._finish(request, response, timings, time.perf_counter() - start)
+
+    def _finish(self, request, response, timings, elapsed):
+        timing.add('total', elapsed)
+        response['Server-Timing'] = timings.server_timing()
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(elapsed * 1000, 3),
+            'stages': timings.as_dict(),
+        }))
+        return response
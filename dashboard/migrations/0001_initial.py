@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileCurve',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('library', models.CharField(max_length=255)),
+                ('etch_ion_flux', models.FloatField()),
+                ('etch_neu_flux', models.FloatField()),
+                ('dep_ion_flux', models.FloatField()),
+                ('dep_neu_flux', models.FloatField()),
+                ('n_cycles', models.FloatField()),
+                ('depth', models.FloatField()),
+                ('num_points', models.PositiveIntegerField()),
+                ('points', models.BinaryField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('library', 'dep_ion_flux', 'dep_neu_flux', 'n_cycles', 'etch_ion_flux', 'etch_neu_flux'), name='unique_profile_curve')],
+            },
+        ),
+    ]
@@ -1,3 +1,43 @@
+import numpy as np
 from django.db import models
 
-# Create your models here.
+POINTS_DTYPE = np.dtype('<f4')
+
+
+class ProfileCurve(models.Model):
+    """
+    One curve of a profile library, e.g. the entry "3_0.5_0_0_4" of
+    etching_only_db.json. The points are stored as little-endian float32
+    (x, y) pairs.
+    """
+
+    library = models.CharField(max_length=255)
+    etch_ion_flux = models.FloatField()
+    etch_neu_flux = models.FloatField()
+    dep_ion_flux = models.FloatField()
+    dep_neu_flux = models.FloatField()
+    n_cycles = models.FloatField()
+    depth = models.FloatField()
+    num_points = models.PositiveIntegerField()
+    points = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['library', 'dep_ion_flux', 'dep_neu_flux', 'n_cycles', 'etch_ion_flux', 'etch_neu_flux'],
+                name='unique_profile_curve'),
+        ]
+
+    def __str__(self):
+        return f"{self.library} {self.params()}"
+
+    def params(self):
+        return (self.etch_ion_flux, self.etch_neu_flux, self.dep_ion_flux, self.dep_neu_flux, self.n_cycles)
+
+    @staticmethod
+    def encode_points(points):
+        points = np.asarray(points, dtype=np.float64)
+        return points.reshape(len(points), -1)[:, :2].astype(POINTS_DTYPE).tobytes()
+
+    def get_points(self):
+        return np.frombuffer(self.points, dtype=POINTS_DTYPE).reshape(-1, 2)
@@ -0,0 +1,134 @@
+import os
+
+from django.conf import settings
+
+from etchingsim import (RENDERER_VERSION, get_render_cache, load_flux_index, load_profile_db, load_profile_grid, load_spectra,
+                        predictive_depth, profile_db_version)
+
+from .profiles import ProfileLibrary
+
+CALLIBRATED_DEPTH = 60/8539.88
+
+# Slider bounds of the dashboard: the range ends at RANGE_LIMIT, or
+# ETCHING_ONLY_WINDOW samples after its start without deposition
+RANGE_LIMIT = 7000
+ETCHING_ONLY_WINDOW = 110
+
+
+def render_cache():
+    return get_render_cache(settings.RENDER_CACHE_DIR, settings.RENDER_CACHE_MAX_BYTES)
+
+
+def csv_file_path():
+    return os.path.join(settings.BASE_DIR, 'data', 'etchingdata.csv')
+
+
+def profile_db_path(params):
+    profile_db_file = 'etching_only_db.json' if params.get('no_deposition') else 'etching_db_new.json'
+    return os.path.join(settings.BASE_DIR, 'data', profile_db_file)
+
+
+def profile_library(profile_db_path, db_version=None):
+    """
+    Returns (data, spectra, grid) of a profile database. With PROFILE_SOURCE
+    set to 'database' the curves are read from the ProfileCurve rows of the
+    library named after the file, fetching only the curves each profile
+    needs; spectra is then None. db_version, from library_version, saves
+    querying the library version again.
+    """
+    if settings.PROFILE_SOURCE == 'database':
+        library = ProfileLibrary(os.path.splitext(os.path.basename(profile_db_path))[0])
+        return library, None, library.grid(db_version)
+    return load_profile_db(profile_db_path), load_spectra(profile_db_path), load_profile_grid(profile_db_path)
+
+
+def library_version(profile_db_path):
+    """
+    Returns the version of the profile database the dashboard reads for
+    profile_db_path, the file or its ProfileCurve rows.
+    """
+    if settings.PROFILE_SOURCE == 'database':
+        return ProfileLibrary(os.path.splitext(os.path.basename(profile_db_path))[0]).version()
+    return profile_db_version(profile_db_path)
+
+
+def operating_point(params, db_version=None):
+    """
+    Parses the dashboard parameters and computes the flux statistics of the
+    selected range.
+
+    Args:
+        params (QueryDict): The request's GET or POST parameters.
+        db_version (str): Version of the profile database, when the request
+            already looked it up.
+
+    Returns:
+        dict: The inputs of the profile generation and the flux statistics.
+
+    Raises:
+        ValueError: If the range ends are not integers or the neutral flux
+            is not a number.
+    """
+    neutral_particle_flux = params.get('neutral_particle_flux', 500)
+    ion_deposition_flux = 3
+    neu_deposition_flux = 2
+    no_deposition = params.get('no_deposition')
+    try:
+        start_range = int(params.get('start_range', 1000))
+        end_range = int(params.get('end_range', 7000)) #len(ion_flux)))
+        neutral_flux = float(neutral_particle_flux)
+    except (TypeError, ValueError):
+        raise ValueError('start_range and end_range must be integers and neutral_particle_flux a number.')
+    max_limit = RANGE_LIMIT
+    etching_limits = [2,4]
+
+    if (no_deposition):
+        ion_deposition_flux = 0
+        neu_deposition_flux = 0
+        max_limit = start_range + ETCHING_ONLY_WINDOW
+        etching_limits = [3,4]
+
+    # Path to the data files
+    csv_path = csv_file_path()
+    db_path = profile_db_path(params)
+
+    # Calculate results
+    flux_index = load_flux_index(csv_path)
+    average_ion_flux = flux_index.average_above(start_range, end_range)
+    n_cycles = flux_index.count_cycles(start_range, end_range)
+    predicted_depth = predictive_depth(average_ion_flux/1000, neutral_flux/1000, ion_deposition_flux, neu_deposition_flux, n_cycles)
+
+    return {
+        'csv_file_path': csv_path,
+        'profile_db_path': db_path,
+        'db_version': db_version or library_version(db_path),
+        'start_range': start_range,
+        'end_range': end_range,
+        'max_limit': max_limit,
+        'neutral_particle_flux': neutral_particle_flux,
+        'average_ion_flux': average_ion_flux,
+        'etch_ion_flux': average_ion_flux/1000,
+        'etch_neu_flux': neutral_flux/1000,
+        'dep_ion_flux': ion_deposition_flux,
+        'dep_neu_flux': neu_deposition_flux,
+        'n_cycles': n_cycles,
+        'etching_limits': etching_limits,
+        'predicted_depth': predicted_depth,
+    }
+
+
+def render_key(cache, point):
+    """
+    Returns the render cache key of an operating point, which changes with
+    RENDERER_VERSION.
+    """
+    return cache.key({
+        'renderer_version': RENDERER_VERSION,
+        'etch_ion_flux': point['etch_ion_flux'],
+        'etch_neu_flux': point['etch_neu_flux'],
+        'dep_ion_flux': point['dep_ion_flux'],
+        'dep_neu_flux': point['dep_neu_flux'],
+        'n_cycles': point['n_cycles'],
+        'etching_limits': point['etching_limits'],
+        'db_version': point['db_version'],
+    })
@@ -0,0 +1,95 @@
+import operator
+import threading
+from collections.abc import Mapping
+from functools import reduce
+
+from django.db.models import Count, Max, Q
+
+from etchingsim import ProfileGrid, curve_key, parse_key
+
+from .models import ProfileCurve
+
+PARAM_FIELDS = ('etch_ion_flux', 'etch_neu_flux', 'dep_ion_flux', 'dep_neu_flux', 'n_cycles')
+
+# {library: (version, ProfileGrid)}, shared by the requests of the process
+_grids = {}
+_grids_lock = threading.Lock()
+
+
+class ProfileLibrary(Mapping):
+    """
+    Profile database backed by the ProfileCurve rows of one library.
+
+    Behaves like the JSON profile database, library[key] returning
+    {"points": ndarray of shape (n, 2), "depth": float}, but nothing is
+    loaded up front. etchingsim calls fetch() with the corner keys of an
+    operating point, which reads just those curves in a single query.
+
+    Args:
+        library (str): Name the curves were loaded under, see load_profiles.
+    """
+
+    def __init__(self, library):
+        self.library = library
+
+    def _curves(self):
+        return ProfileCurve.objects.filter(library=self.library)
+
+    def fetch(self, keys):
+        """
+        Returns {key: {"points": ..., "depth": ...}} for the given keys that
+        exist in the library, read in one query.
+        """
+        wanted = {}
+        for key in keys:
+            params = parse_key(key)
+            if params is not None:
+                wanted[params] = key
+        if not wanted:
+            return {}
+        query = reduce(operator.or_, (Q(**dict(zip(PARAM_FIELDS, params))) for params in wanted))
+        curves = {}
+        for curve in self._curves().filter(query):
+            key = wanted.get(curve.params())
+            if key is not None:
+                curves[key] = {'points': curve.get_points(), 'depth': curve.depth}
+        return curves
+
+    def __getitem__(self, key):
+        return self.fetch([key])[key]
+
+    def __contains__(self, key):
+        params = parse_key(key)
+        return params is not None and self._curves().filter(**dict(zip(PARAM_FIELDS, params))).exists()
+
+    def __iter__(self):
+        for params in self._curves().values_list(*PARAM_FIELDS):
+            yield curve_key(*params)
+
+    def __len__(self):
+        return self._curves().count()
+
+    def grid(self, version=None):
+        """
+        Returns the ProfileGrid of the library, built from the parameter
+        columns only. It is kept per process and rebuilt when the library
+        version changes; pass version when it is already known to skip
+        that query.
+        """
+        if version is None:
+            version = self.version()
+        with _grids_lock:
+            cached = _grids.get(self.library)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        grid = ProfileGrid(list(self))
+        with _grids_lock:
+            _grids[self.library] = (version, grid)
+        return grid
+
+    def version(self):
+        """
+        Returns a string that changes whenever the library is reloaded.
+        """
+        stats = self._curves().aggregate(count=Count('id'), last=Max('id'))
+        return f"db:{self.library}:{stats['count']}:{stats['last']}"
@@ -1,3 +1,1124 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import TestCase, override_settings
+
+from django.core.management import CommandError, call_command
+
+from .executor import BoundedExecutor, Overloaded
+from .management.commands.prerender_grid import slider_windows
+from .models import ProfileCurve
+from .profiles import ProfileLibrary
+
+import fft_reconstruct
+from curve_resample import arc_length, resample_arc_length
+from etchingsim import timing
+from etchingsim import (RENDERER_VERSION, curve_key, etching_data_1, etching_profile, etching_profile_batch,
+                        generate_etching_profile, parameter_grid, predictive_depth, predictive_depth_batch)
+from flux_data import load_flux_series, sidecar_path
+from flux_pyramid import FluxPyramid
+from flux_stream import iter_cycles, iter_flux_chunks, summarize, window_chunks
+from flux_stats import FluxIndex, count_cycle, threshold_filter
+from profile_db import FileCache, load_profile_db, load_profile_grid, load_spectra
+from profile_grid import ProfileGrid
+from profile_store import ProfileStore, convert_json_db, pack_profiles, write_store
+from render_cache import RenderCache
+from render_pool import QueueFull, RenderJob, RenderPool
+from spectral_library import CompressedSpectralLibrary, SpectralLibrary, compression_report
+import vtp_ingest
+from vtp_ingest import ingest_vtp_files, journal_path, read_profile
+from vtp_to_svg import intermediate_points_generation, points_to_svg, read_vtp, smoothing, smoothing_array
+
+
+class FileCacheTests(TestCase):
+    def setUp(self):
+        self.loads = 0
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "db.json")
+        with open(self.path, "w") as f:
+            f.write('{"a": 1}')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _loader(self, path):
+        self.loads += 1
+        with open(path) as f:
+            return f.read()
+
+    def test_file_is_parsed_once(self):
+        cache = FileCache(self._loader)
+        first = cache.get(self.path)
+        second = cache.get(self.path)
+        self.assertIs(first, second)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_changed_file_is_reloaded(self):
+        cache = FileCache(self._loader)
+        cache.get(self.path)
+        with open(self.path, "w") as f:
+            f.write('{"a": 1, "b": 2}')
+        self.assertEqual(cache.get(self.path), '{"a": 1, "b": 2}')
+        self.assertEqual(cache.stats()["reloads"], 1)
+
+    def test_load_profile_db(self):
+        data = load_profile_db("data/etching_only_db.json")
+        self.assertIn("3_0.5_0_0_0", data)
+        self.assertIs(data, load_profile_db("data/etching_only_db.json"))
+
+
+class ProfileStoreTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        with open("data/etching_only_db.json") as f:
+            self.data = json.load(f)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        out_path = convert_json_db("data/etching_only_db.json",
+                                   os.path.join(self.tmpdir.name, "db.etchdb"), num_points=None)
+        store = ProfileStore(out_path)
+        self.assertEqual(sorted(store), sorted(self.data))
+        for key, entry in self.data.items():
+            expected = np.asarray(entry["points"])[:, :2]
+            np.testing.assert_array_equal(store[key]["points"], expected)
+            self.assertEqual(store[key]["depth"], entry["depth"])
+
+    def test_curves_are_resampled(self):
+        out_path = convert_json_db("data/etching_only_db.json",
+                                   os.path.join(self.tmpdir.name, "db.etchdb"), num_points=128)
+        store = ProfileStore(out_path)
+        self.assertEqual(set(store.lengths.tolist()), {128})
+        self.assertEqual(store.meta["num_points"], 128)
+        for key, entry in self.data.items():
+            expected = np.asarray(entry["points"])[:, :2]
+            np.testing.assert_array_equal(store[key]["points"][[0, -1]], expected[[0, -1]])
+            self.assertEqual(store[key]["depth"], entry["depth"])
+
+    def test_points_are_memory_mapped(self):
+        out_path = convert_json_db("data/etching_only_db.json",
+                                   os.path.join(self.tmpdir.name, "db.etchdb"), dtype="float32")
+        points = ProfileStore(out_path)["3_0.5_0_0_0"]["points"]
+        self.assertEqual(points.dtype, np.float32)
+        self.assertIsInstance(points.base, np.memmap)
+        self.assertFalse(points.flags.writeable)
+
+    def test_binary_store_is_preferred(self):
+        json_path = os.path.join(self.tmpdir.name, "db.json")
+        with open(json_path, "w") as f:
+            json.dump(self.data, f)
+        convert_json_db(json_path)
+        self.assertIsInstance(load_profile_db(json_path), ProfileStore)
+
+
+class ResampleTests(TestCase):
+    def test_points_are_evenly_spaced(self):
+        curve = load_profile_db("data/etching_only_db.json")["3_0.5_0_0_4"]["points"]
+        resampled = resample_arc_length(curve, 50)
+        self.assertEqual(resampled.shape, (50, 2))
+        spacing = np.hypot(*np.diff(resampled, axis=0).T)
+        # Chords are at most as long as the arc length between samples
+        self.assertLessEqual(spacing.max(), arc_length(np.asarray(curve)[:, :2])[-1] / 49 + 1e-9)
+        np.testing.assert_array_equal(resampled[[0, -1]], np.asarray(curve)[[0, -1], :2])
+
+    def test_polyline_vertices(self):
+        points = np.array([[0.0, 0.0], [2.0, 0.0], [2.0, 2.0]])
+        np.testing.assert_allclose(resample_arc_length(points, 5),
+                                   [[0, 0], [1, 0], [2, 0], [2, 1], [2, 2]])
+
+    def test_degenerate_curves(self):
+        self.assertEqual(resample_arc_length([], 10).shape, (0, 2))
+        np.testing.assert_array_equal(resample_arc_length([[1.0, 2.0, 0.0]] * 3, 4), [[1.0, 2.0]] * 4)
+
+
+class FluxDataTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmpdir.name, "flux.csv")
+        with open(self.csv_path, "w") as f:
+            f.write("nm,a,b,c\n1,10,20,30\n3,30,40,50\n5,0,0,0\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_rows_are_averaged(self):
+        depth, flux, time_stamp = etching_data_1(self.csv_path, rows=(0, 2), time_step=100)
+        self.assertEqual(depth, 2)
+        np.testing.assert_array_equal(flux, [20, 30, 40])
+        np.testing.assert_array_equal(time_stamp, [100, 200, 300])
+
+    def test_sidecar_is_rebuilt_when_csv_changes(self):
+        load_flux_series(self.csv_path, rows=(0, 1))
+        self.assertTrue(os.path.exists(sidecar_path(self.csv_path, (0, 1))))
+        with open(self.csv_path, "w") as f:
+            f.write("nm,a\n7,8\n")
+        os.utime(self.csv_path, ns=(0, 10**9))
+        np.testing.assert_array_equal(load_flux_series(self.csv_path, rows=(0, 1)), [7, 8])
+
+
+def reference_dft_at_frequencies(z, freqs):
+    N = len(z)
+    n = np.arange(N)
+    return np.array([np.sum(z * np.exp(-2j * np.pi * f * n / N)) / N for f in freqs])
+
+
+def reference_reconstruct_curve(coeffs, freqs, num_points=400, top_k=None):
+    t = np.linspace(0, 1, num_points, endpoint=False)
+    z_rec = np.zeros(num_points, dtype=complex)
+    if top_k is not None:
+        indices = np.argsort(-np.abs(coeffs))[:top_k]
+    else:
+        indices = range(len(coeffs))
+    for i in indices:
+        z_rec += coeffs[i] * np.exp(2j*np.pi*freqs[i]*t)
+    return z_rec
+
+
+class FourierEngineTests(TestCase):
+    def setUp(self):
+        data = load_profile_db("data/etching_only_db.json")
+        self.curves = [np.asarray(data[key]["points"])[:, :2] for key in
+                       ("3_0.5_0_0_4", "4_0.5_0_0_4", "3_1.5_0_0_2")]
+
+    def test_forward_transform_matches_reference(self):
+        for curve in self.curves:
+            z = curve[:, 0] + 1j*curve[:, 1]
+            freqs = np.linspace(-50, 50, len(z))
+            expected = reference_dft_at_frequencies(z, freqs)
+            np.testing.assert_allclose(fft_reconstruct.dft_at_frequencies(z, freqs), expected, atol=1e-10)
+            np.testing.assert_allclose(fft_reconstruct.dft_at_frequencies(z, freqs[::3]), expected[::3], atol=1e-10)
+            np.testing.assert_allclose(fft_reconstruct.forward_transform(z), expected, atol=1e-10)
+
+    def test_inverse_transform_matches_reference(self):
+        for curve in self.curves:
+            z = curve[:, 0] + 1j*curve[:, 1]
+            freqs, coeffs, _ = fft_reconstruct.fourier_curve_reconstruction(curve[:, 0], curve[:, 1])
+            for top_k in (None, 10):
+                np.testing.assert_allclose(fft_reconstruct.reconstruct_curve(coeffs, freqs, top_k=top_k),
+                                           reference_reconstruct_curve(coeffs, freqs, top_k=top_k), atol=1e-9)
+
+    def test_batched_transforms_match_single_curves(self):
+        n = min(len(curve) for curve in self.curves)
+        z = np.stack([curve[:n, 0] + 1j*curve[:n, 1] for curve in self.curves])
+        coeffs = fft_reconstruct.forward_transform(z)
+        curves = fft_reconstruct.inverse_transform(coeffs)
+        self.assertEqual(curves.shape, (len(self.curves), 400))
+        for i in range(len(self.curves)):
+            np.testing.assert_allclose(curves[i], fft_reconstruct.inverse_transform(coeffs[i]), atol=1e-10)
+
+    def test_intermediate_curve_matches_reference(self):
+        curve1, curve2 = self.curves[0], self.curves[1][:len(self.curves[0])]
+        z1 = curve1[:, 0] + 1j*curve1[:, 1]
+        z2 = curve2[:, 0] + 1j*curve2[:, 1]
+        freqs = np.linspace(-50, 50, len(z1))
+        expected = reference_reconstruct_curve(
+            0.3*reference_dft_at_frequencies(z1, freqs) + 0.7*reference_dft_at_frequencies(z2, freqs), freqs)
+        x, y = fft_reconstruct.intermeidate_curve(curve1[:, 0], curve1[:, 1], curve2[:, 0], curve2[:, 1], 0.3)
+        np.testing.assert_allclose(x + 1j*y, expected, atol=1e-9)
+
+
+class SpectralLibraryTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = load_profile_db("data/etching_only_db.json")
+        self.spectra = SpectralLibrary.from_profiles(self.data)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_blend_is_linear_in_coefficients(self):
+        keys = ["3_0.5_0_0_2", "4_0.5_0_0_2"]
+        blended = self.spectra.blend_curve(keys, [0.25, 0.75])
+        expected = (0.25*self.spectra.blend_curve(keys[:1], [1.0])
+                    + 0.75*self.spectra.blend_curve(keys[1:], [1.0]))
+        np.testing.assert_allclose(blended, expected, atol=1e-10)
+
+    def test_store_keeps_coefficients(self):
+        out_path = convert_json_db("data/etching_only_db.json",
+                                   os.path.join(self.tmpdir.name, "db.etchdb"))
+        stored = ProfileStore(out_path).spectra
+        for key in self.spectra.keys:
+            np.testing.assert_array_equal(stored.coeffs[stored.index[key]],
+                                          self.spectra.coeffs[self.spectra.index[key]])
+
+    def test_generate_profile_from_spectra(self):
+        svg_path = os.path.join(self.tmpdir.name, "profile.svg")
+        depth = generate_etching_profile(3.4, 0.8, 0, 0, 3, self.data, svg_path, [3, 4])
+        depth_spectral = generate_etching_profile(3.4, 0.8, 0, 0, 3, self.data, svg_path, [3, 4],
+                                                  self.spectra)
+        self.assertEqual(depth, depth_spectral)
+        with open(svg_path) as f:
+            self.assertIn("<svg", f.read())
+
+
+class SpectralCompressionTests(TestCase):
+    def setUp(self):
+        self.data = load_profile_db("data/etching_only_db.json")
+        self.spectra = SpectralLibrary.from_profiles(self.data)
+        self.keys = ["3_0.5_0_0_2", "4_0.5_0_0_2", "3_1.5_0_0_3"]
+        self.weights = [0.2, 0.5, 0.3]
+
+    def test_cosine_basis_is_orthonormal(self):
+        basis = fft_reconstruct.cosine_basis(self.spectra.length)
+        np.testing.assert_allclose(basis.T @ basis, np.eye(self.spectra.length), atol=1e-12)
+        np.testing.assert_allclose(fft_reconstruct.inverse_transform(
+            self.spectra.samples @ basis @ fft_reconstruct.cosine_fourier_basis(self.spectra.length)),
+            fft_reconstruct.inverse_transform(self.spectra.coeffs), atol=1e-9)
+
+    def test_top_k_keeps_the_largest_coefficients(self):
+        values, indices = fft_reconstruct.top_k_coefficients(self.spectra.coeffs, 10)
+        self.assertEqual(values.dtype, np.complex64)
+        self.assertEqual(indices.dtype, np.uint8)
+        self.assertTrue(np.all(np.diff(indices.astype(int), axis=1) > 0))
+        magnitudes = np.sort(np.abs(self.spectra.coeffs), axis=1)
+        np.testing.assert_allclose(np.sort(np.abs(values), axis=1), magnitudes[:, -10:], rtol=1e-6)
+
+        values, indices = fft_reconstruct.top_k_coefficients(self.spectra.coeffs, 1000)
+        np.testing.assert_allclose(fft_reconstruct.expand_coefficients(values, indices, self.spectra.length),
+                                   self.spectra.coeffs, rtol=1e-6, atol=1e-6)
+
+    def test_sparse_blend_matches_dense_blend(self):
+        compressed = self.spectra.compress(20)
+        self.assertEqual(compressed.nbytes, 20 * 9 * len(self.spectra.keys))
+        expected = fft_reconstruct.inverse_transform(
+            np.asarray(self.weights) @ compressed.rows([compressed.index[key] for key in self.keys]))
+        np.testing.assert_allclose(compressed.blend_curve(self.keys, self.weights), expected, atol=1e-9)
+        np.testing.assert_allclose(self.spectra.compress(self.spectra.length).blend_curve(self.keys, self.weights),
+                                   self.spectra.blend_curve(self.keys, self.weights), atol=1e-4)
+
+    def test_compressed_store_and_profiles(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out_path = os.path.join(tmpdir, "db.etchdb")
+            with self.assertRaises(CommandError):
+                call_command("convert_profile_db", "data/etching_only_db.json", "--top-k", "30",
+                             "--output", out_path, stdout=io.StringIO())
+            self.assertFalse(os.path.exists(out_path))
+            call_command("convert_profile_db", "data/etching_only_db.json", "--top-k", "100",
+                         "--output", out_path, stdout=io.StringIO())
+            self.assertLess(ProfileStore(out_path).spectra.nbytes, self.spectra.nbytes / 3)
+            convert_json_db("data/etching_only_db.json", out_path, top_k=self.spectra.length)
+            convert_json_db("data/etching_only_db.json", out_path, top_k=30, max_error=1.0)
+            stored = ProfileStore(out_path).spectra
+            self.assertIsInstance(stored, CompressedSpectralLibrary)
+            np.testing.assert_array_equal(stored.values, self.spectra.compress(30).values)
+            grid = load_profile_grid("data/etching_only_db.json")
+            depth, points = etching_profile(3.4, 0.8, 0, 0, 3, self.data, [3, 4], stored, grid=grid)
+            _, profiles = etching_profile_batch([3.4], 0.8, 0, 0, 3, self.data, [3, 4], stored,
+                                                with_curves=True, grid=grid)
+            np.testing.assert_allclose(profiles[0], points, atol=1e-8)
+
+            # Stores compressed in the former basis are refused
+            write_store(out_path, *pack_profiles(self.data, top_k=30, max_error=1.0), meta={"top_k": 30})
+            with self.assertRaises(ValueError):
+                ProfileStore(out_path)
+
+    def test_report_trades_size_for_error(self):
+        report = compression_report(self.spectra, [5, 50, self.spectra.length])
+        self.assertEqual([row["top_k"] for row in report], [5, 50, self.spectra.length])
+        self.assertTrue(report[0]["bytes"] < report[1]["bytes"] < report[2]["bytes"])
+        self.assertGreater(report[0]["rms_error"], report[1]["rms_error"])
+        self.assertLess(report[2]["relative_error"], 1e-6)
+
+
+class FluxIndexTests(TestCase):
+    def setUp(self):
+        self.flux = np.asarray(etching_data_1("data/etchingdata.csv")[1])
+        self.index = FluxIndex(self.flux)
+
+    def reference_count_cycle(self, sequence, filter=4800):
+        return sum(1 for i in range(len(sequence) - 1)
+                   if sequence[i+1] > filter and sequence[i] <= filter)
+
+    def test_vectorized_filters_match_loops(self):
+        window = self.flux[1000:7000]
+        np.testing.assert_array_equal(threshold_filter(window), [v for v in window if v > 2500])
+        self.assertEqual(count_cycle(window), self.reference_count_cycle(window))
+
+    def test_window_queries_match_slices(self):
+        rng = np.random.default_rng(0)
+        windows = [(1000, 7000), (1000, 1110), (0, 1), (5, 5), (6000, 9000), (-500, -10)]
+        windows += [tuple(sorted(rng.integers(0, len(self.flux), 2))) for _ in range(50)]
+        for start, end in windows:
+            window = self.flux[start:end]
+            self.assertEqual(self.index.count_cycles(start, end), self.reference_count_cycle(window))
+            above = window[window > 2500]
+            if len(above):
+                self.assertAlmostEqual(self.index.average_above(start, end), np.mean(above), places=6)
+            else:
+                self.assertTrue(np.isnan(self.index.average_above(start, end)))
+
+
+class FluxStreamTests(TestCase):
+    csv_path = "data/etchingdata.csv"
+
+    def setUp(self):
+        self.flux = np.asarray(load_flux_series(self.csv_path))[1:]
+
+    def test_chunks_match_in_memory_series(self):
+        for chunk_size, read_size in ((65536, 1 << 20), (1000, 333), (7, 64)):
+            chunks = list(iter_flux_chunks(self.csv_path, chunk_size=chunk_size, read_size=read_size))
+            self.assertLessEqual(max(len(chunk) for chunk in chunks), chunk_size)
+            np.testing.assert_array_equal(np.concatenate(chunks), self.flux)
+
+    def test_missing_values_and_trailing_newline(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = os.path.join(tmpdir, "flux.csv")
+            with open(csv_path, "w") as f:
+                f.write("nm,a,b,c\n1,2,4,6\n3,4,,8\n")
+            chunks = list(iter_flux_chunks(csv_path, rows=(0, 4), chunk_size=2, read_size=3))
+            np.testing.assert_array_equal(np.concatenate(chunks), [3, np.nan, 7])
+
+    def test_window_summary_matches_in_memory_functions(self):
+        for start, end in ((1000, 7000), (1000, 1110), (0, 6800), (2500, 2501)):
+            window = self.flux[start:end]
+            summary = summarize(window_chunks(iter_flux_chunks(self.csv_path, chunk_size=97), start, end))
+            self.assertEqual(summary.samples, len(window))
+            self.assertEqual(summary.n_cycles, count_cycle(window))
+            self.assertEqual(summary.samples_above, len(threshold_filter(window)))
+            if summary.samples_above:
+                self.assertAlmostEqual(summary.average_above, np.mean(threshold_filter(window)), places=6)
+            self.assertEqual(summary.peak, window.max())
+
+    def test_cycles_carry_across_chunks(self):
+        expected = list(iter_cycles([self.flux]))
+        self.assertEqual(len(expected), count_cycle(self.flux))
+        for chunk_size in (1, 7, 100):
+            cycles = list(iter_cycles(iter_flux_chunks(self.csv_path, chunk_size=chunk_size)))
+            self.assertEqual([cycle[:4] + cycle[6:] for cycle in cycles],
+                             [cycle[:4] + cycle[6:] for cycle in expected])
+            np.testing.assert_allclose([cycle.mean_above for cycle in cycles],
+                                       [cycle.mean_above for cycle in expected], rtol=1e-12)
+        for cycle in expected[:-1]:
+            segment = self.flux[cycle.start:cycle.end]
+            self.assertTrue(segment[0] > 4800 >= self.flux[cycle.start - 1])
+            self.assertEqual(count_cycle(segment), 0)
+            self.assertEqual(cycle.peak, segment.max())
+            self.assertEqual(cycle.duration, 250 * len(segment))
+        self.assertFalse(expected[-1].complete)
+
+
+class FluxPyramidTests(TestCase):
+    def setUp(self):
+        self.flux = np.asarray(etching_data_1("data/etchingdata.csv")[1])
+        self.pyramid = FluxPyramid(self.flux)
+
+    def test_short_windows_are_not_downsampled(self):
+        positions, values = self.pyramid.window(1000, 1100, 500)
+        np.testing.assert_array_equal(positions, np.arange(1000, 1100))
+        np.testing.assert_array_equal(values, self.flux[1000:1100])
+
+    def test_downsampled_windows_keep_the_peaks(self):
+        rng = np.random.default_rng(0)
+        windows = [(0, len(self.flux)), (1000, 7000), (-3000, -1)]
+        windows += [tuple(sorted(rng.integers(0, len(self.flux), 2))) for _ in range(30)]
+        for start, end in windows:
+            for num_points in (3, 64, 500):
+                positions, values = self.pyramid.window(start, end, num_points)
+                window = self.flux[start:end]
+                if not len(window):
+                    self.assertEqual(len(positions), 0)
+                    continue
+                self.assertLessEqual(len(positions), max(num_points, 2))
+                self.assertTrue(np.all(np.diff(positions) > 0))
+                np.testing.assert_array_equal(values, self.flux[positions])
+                self.assertEqual(values.max(), window.max())
+                self.assertEqual(values.min(), window.min())
+
+
+class SvgWriterTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.points = np.array([[0.0, 0.0], [1.0, 2.5], [2.0, 1.0]])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_single_polyline(self):
+        content = points_to_svg(self.points).decode()
+        self.assertEqual(content.count("<polyline"), 1)
+        self.assertNotIn("<circle", content)
+        self.assertIn('points="0.0000,0.0000 1.0000,2.5000 2.0000,1.0000"', content)
+
+    def test_list_of_tuples_and_precision(self):
+        content = points_to_svg([tuple(p) for p in self.points], precision=1).decode()
+        self.assertIn('points="0.0,0.0 1.0,2.5 2.0,1.0"', content)
+
+    def test_svgz_output(self):
+        svgz_path = os.path.join(self.tmpdir.name, "points.svgz")
+        points_to_svg(self.points, svgz_path)
+        with open(svgz_path, "rb") as f:
+            self.assertEqual(gzip.decompress(f.read()), points_to_svg(self.points))
+
+    def test_empty_points(self):
+        self.assertIsNone(points_to_svg([]))
+
+
+def reference_smoothing(points, iterations=3):
+    for _ in range(iterations):
+        points = [(0.5*(points[i][0] + points[i+1][0]), 0.5*(points[i][1] + points[i+1][1]))
+                  for i in range(len(points) - 1)]
+    return points
+
+
+class SmoothingTests(TestCase):
+    def setUp(self):
+        data = load_profile_db("data/etching_only_db.json")
+        self.curve = np.asarray(data["3_0.5_0_0_4"]["points"])[:, :2]
+
+    def test_matches_reference(self):
+        for iterations in (0, 1, 3, 10):
+            expected = reference_smoothing([tuple(p) for p in self.curve], iterations)
+            np.testing.assert_allclose(smoothing(self.curve, iterations), expected, atol=1e-10)
+
+    def test_short_input(self):
+        self.assertEqual(smoothing(self.curve[:5], 10).shape, (0, 2))
+        self.assertEqual(smoothing([], 10).shape, (0, 2))
+
+    def test_array_smoothing_along_last_axis(self):
+        z = self.curve[:, 0] + 1j*self.curve[:, 1]
+        expected = smoothing(self.curve, 10)
+        smoothed = smoothing_array(np.stack([z, 2*z]), 10)
+        np.testing.assert_allclose(smoothed[0], expected[:, 0] + 1j*expected[:, 1], atol=1e-10)
+        np.testing.assert_allclose(smoothed[1], 2*smoothed[0], atol=1e-10)
+
+    def test_intermediate_points_are_arrays(self):
+        points = intermediate_points_generation(self.curve, self.curve[:50].tolist(), 0.5)
+        self.assertIsInstance(points, np.ndarray)
+        self.assertEqual(points.shape, (390, 2))
+
+
+class RenderCacheTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.renders = 0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _render(self, path):
+        self.renders += 1
+        with open(path, "w") as f:
+            f.write("x" * 100)
+        return {"depth": 1.5}
+
+    def test_rounded_inputs_share_an_entry(self):
+        cache = RenderCache(self.tmpdir.name, precision=4)
+        self.assertEqual(cache.key({"flux": 3.00001}), cache.key({"flux": 3.0}))
+        self.assertNotEqual(cache.key({"flux": 3.001}), cache.key({"flux": 3.0}))
+
+    def test_get_or_render_renders_once(self):
+        cache = RenderCache(self.tmpdir.name)
+        key = cache.key({"flux": 3.0})
+        self.assertEqual(cache.get_or_render(key, self._render), {"depth": 1.5})
+        self.assertEqual(cache.get_or_render(key, self._render), {"depth": 1.5})
+        self.assertEqual(self.renders, 1)
+        self.assertTrue(os.path.exists(cache.path(key)))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = RenderCache(self.tmpdir.name, max_bytes=300)
+        keys = [cache.key({"flux": float(i)}) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.render(key, self._render)
+            os.utime(cache.path(key), ns=(i * 10**9, i * 10**9))
+            os.utime(os.path.join(self.tmpdir.name, key + ".json"), ns=(i * 10**9, i * 10**9))
+        cache.render(cache.key({"flux": 4.0}), self._render)
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+    def test_directory_is_scanned_only_over_budget(self):
+        cache = RenderCache(self.tmpdir.name, max_bytes=10**6)
+        with mock.patch("render_cache.os.scandir", wraps=os.scandir) as scandir:
+            for i in range(50):
+                cache.render(cache.key({"flux": float(i)}), self._render)
+        # Once to learn the size, then only the running total is updated
+        self.assertEqual(scandir.call_count, 1)
+
+    def test_entries_removed_concurrently_are_skipped(self):
+        cache = RenderCache(self.tmpdir.name, max_bytes=10)
+        cache.render(cache.key({"flux": 1.0}), self._render)
+        entry = mock.Mock(name="entry")
+        entry.name = "gone.svg"
+        entry.stat.side_effect = FileNotFoundError
+        with mock.patch("render_cache.os.scandir", return_value=[entry]):
+            cache.evict()
+
+
+class RenderDirTestCase(TestCase):
+    """
+    Points RENDER_CACHE_DIR at a temporary directory, self.render_dir, for
+    the duration of each test.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.render_dir = os.path.join(self.tmpdir.name, "renders")
+        self.settings_override = override_settings(RENDER_CACHE_DIR=self.render_dir)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+
+class DashboardViewTests(RenderDirTestCase):
+    def post(self):
+        return self.client.post("/", {"no_deposition": "on", "start_range": 1000,
+                                      "end_range": 1100, "neutral_particle_flux": 500})
+
+    def test_profile_is_rendered_into_the_cache(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["n_cycles"], 3)
+        image_url = response.context["image_url"]
+        self.assertEqual(len(os.listdir(self.render_dir)), 2)
+
+        self.assertEqual(self.post().context["image_url"], image_url)
+        self.assertEqual(len(os.listdir(self.render_dir)), 2)
+
+        image = self.client.get(image_url)
+        self.assertEqual(image.status_code, 200)
+        self.assertIn("immutable", image["Cache-Control"])
+        self.assertIn(b"<polyline", b"".join(image.streaming_content))
+
+    def test_flux_is_served_separately(self):
+        response = self.client.post("/", {"no_deposition": "on", "start_range": 1000,
+                                          "end_range": 7000, "neutral_particle_flux": 500})
+        self.assertNotIn("ion_flux", response.context)
+        flux = self.client.get(response.context["flux_url"])
+        self.assertIn("max-age", flux["Cache-Control"])
+        payload = flux.json()
+        self.assertLessEqual(len(payload["x"]), 500)
+        self.assertTrue(1 <= payload["x"][0] and payload["x"][-1] <= 6000)
+        self.assertEqual(self.client.get("/api/flux/", {"start_range": 1000, "end_range": 1100}).json()["y"],
+                         etching_data_1("data/etchingdata.csv")[1][1000:1100].tolist())
+
+    def test_flux_rejects_malformed_parameters(self):
+        for query in ({"points": "abc"}, {"start_range": "1e3"}, {"end_range": ""}):
+            response = self.client.get("/api/flux/", query)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("error", response.json())
+
+    def test_unknown_render(self):
+        self.assertEqual(self.client.get("/renders/../settings.py").status_code, 404)
+        self.assertEqual(self.client.get("/renders/" + "0" * 64 + ".svg").status_code, 404)
+
+
+class ConditionalRequestTests(RenderDirTestCase):
+    params = {"no_deposition": "on", "start_range": 1000, "end_range": 1100, "neutral_particle_flux": 500}
+
+    def test_unchanged_dashboard_is_not_recomputed(self):
+        response = self.client.get("/", self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        async_etag = self.client.get("/async/", self.params)["ETag"]
+        with mock.patch("dashboard.views._dashboard_context") as context:
+            self.assertEqual(self.client.get("/", self.params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get("/async/", self.params, HTTP_IF_NONE_MATCH=async_etag).status_code, 304)
+            self.assertEqual(self.client.get("/", self.params,
+                                             HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+            context.assert_not_called()
+
+        other = self.client.get("/", dict(self.params, end_range=1110), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other["ETag"], etag)
+        self.assertNotIn("ETag", self.client.post("/", self.params))
+
+    def test_etag_follows_the_data_files(self):
+        etag = self.client.get("/api/profile/", dict(self.params, curve=0))["ETag"]
+        db_path = "data/etching_only_db.json"
+        stat = os.stat(db_path)
+        try:
+            os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            response = self.client.get("/api/profile/", dict(self.params, curve=0), HTTP_IF_NONE_MATCH=etag)
+        finally:
+            os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_flux_and_renders(self):
+        flux = self.client.get("/api/flux/", {"start_range": 1000, "end_range": 2000})
+        self.assertEqual(flux["Cache-Control"], "no-cache")
+        stale = self.client.get("/api/flux/", {"start_range": 1000, "end_range": 2000, "v": "0:0"})
+        self.assertEqual(stale["Cache-Control"], "no-cache")
+        self.assertEqual(self.client.get("/api/flux/", {"start_range": 1000, "end_range": 2000},
+                                         HTTP_IF_NONE_MATCH=flux["ETag"]).status_code, 304)
+
+        image_url = self.client.get("/", self.params).context["image_url"]
+        image = self.client.get(image_url)
+        self.assertEqual(image["ETag"], '"%s"' % os.path.splitext(os.path.basename(image_url))[0])
+        self.assertEqual(self.client.get(image_url, HTTP_IF_NONE_MATCH=image["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get("/renders/" + "0" * 64 + ".svg",
+                                         HTTP_IF_NONE_MATCH='"' + "0" * 64 + '"').status_code, 404)
+
+
+class TimingTests(RenderDirTestCase):
+    def setUp(self):
+        super().setUp()
+        timing.reset()
+
+    def tearDown(self):
+        super().tearDown()
+        timing.enable(True)
+
+    def post(self):
+        return self.client.post("/", {"no_deposition": "on", "start_range": 1000,
+                                      "end_range": 1100, "neutral_particle_flux": 500})
+
+    def test_disabled_stages_are_not_recorded(self):
+        timing.enable(False)
+        with timing.record() as timings:
+            with timing.stage("work"):
+                pass
+            smoothing(np.zeros((20, 2)), 10)
+        self.assertEqual(timings.as_dict(), {})
+        self.assertEqual(timing.histograms(), {})
+
+    def test_stages_from_executor_threads_are_recorded(self):
+        timing.enable(True)
+        executor = BoundedExecutor(1, 1)
+
+        def work():
+            with timing.stage("work"):
+                pass
+
+        with timing.record() as timings:
+            executor.submit(work).result()
+            executor.submit(work).result()
+        self.assertEqual(timings.as_dict()["work"]["count"], 2)
+        self.assertEqual(timing.histograms()["work"]["count"], 2)
+
+    def test_server_timing_header_and_log(self):
+        with self.assertLogs("dashboard.timing", level="INFO") as logs:
+            response = self.post()
+        stages = {entry.split(";")[0] for entry in response["Server-Timing"].split(", ")}
+        self.assertTrue({"flux_index", "profile_db", "render", "blend", "svg", "template"} <= stages)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["path"], "/")
+        self.assertEqual(record["status"], 200)
+        self.assertIn("blend", record["stages"])
+
+    def test_timing_log_has_a_handler(self):
+        handler = logging.getLogger("dashboard.timing").handlers[0]
+        with mock.patch.object(handler, "emit") as emit:
+            self.client.get("/api/profile/", {"no_deposition": "on", "start_range": 1000, "end_range": 1100})
+        record = json.loads(emit.call_args.args[0].getMessage())
+        self.assertEqual(record["path"], "/api/profile/")
+
+    def test_metrics_endpoint(self):
+        self.post()
+        metrics = self.client.get("/metrics/").json()
+        self.assertEqual(metrics["stages"]["total"]["count"], 1)
+        self.assertEqual(sum(metrics["stages"]["blend"]["buckets"].values()), 1)
+        self.assertIn("json", metrics["profile_db_cache"])
+        self.assertEqual(self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
+        self.assertEqual(self.client.get("/metrics/", HTTP_X_METRICS_TOKEN="wrong").status_code, 404)
+        self.assertEqual(self.client.get("/metrics/", HTTP_X_METRICS_TOKEN="secret",
+                                         REMOTE_ADDR="10.0.0.1").status_code, 200)
+
+    @override_settings(TIMING_ENABLED=False)
+    def test_timing_can_be_turned_off(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(timing.histograms(), {})
+
+
+class ProfileApiTests(TestCase):
+    params = {"no_deposition": "on", "start_range": 1000, "end_range": 1100,
+              "neutral_particle_flux": 500}
+
+    def test_profile_as_json(self):
+        response = self.client.get("/api/profile/", self.params)
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload["n_cycles"], 3)
+        self.assertAlmostEqual(payload["calibrated_depth"], 60/8539.88*payload["depth"])
+        self.assertEqual(len(payload["profile"]["x"]), len(payload["profile"]["y"]))
+        self.assertGreater(len(payload["profile"]["x"]), 0)
+
+    def test_curve_can_be_skipped(self):
+        payload = self.client.post("/api/profile/", dict(self.params, curve="0")).json()
+        self.assertNotIn("profile", payload)
+        self.assertEqual(payload["n_cycles"], 3)
+
+    def test_results_match_dashboard(self):
+        with tempfile.TemporaryDirectory() as tmpdir, override_settings(RENDER_CACHE_DIR=tmpdir):
+            context = self.client.post("/", self.params).context
+        payload = self.client.get("/api/profile/", dict(self.params, curve="0")).json()
+        self.assertAlmostEqual(payload["calibrated_depth"], context["actual_depth"])
+        self.assertAlmostEqual(payload["predicted_depth"], context["predicted_depth"])
+
+    def test_profile_rejects_malformed_parameters(self):
+        for url in ("/api/profile/", "/api/async/profile/"):
+            for query in ({"start_range": "abc"}, {"end_range": "1e3"}, {"neutral_particle_flux": "x"}):
+                response = self.client.get(url, dict(self.params, **query))
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+        self.assertEqual(self.client.get("/", dict(self.params, start_range="abc")).status_code, 400)
+
+
+class ParameterSweepTests(TestCase):
+    def setUp(self):
+        self.data = load_profile_db("data/etching_only_db.json")
+        self.spectra = SpectralLibrary.from_profiles(self.data)
+        self.grid = parameter_grid(np.linspace(3, 4, 5), np.linspace(0.5, 1.5, 4), 0, 0, [1, 3])
+
+    def test_grid_covers_all_combinations(self):
+        self.assertEqual(len(self.grid["n_cycles"]), 5 * 4 * 2)
+
+    def test_batch_matches_single_points(self):
+        depth, profiles = etching_profile_batch(*self.grid.values(), self.data, [3, 4], self.spectra,
+                                                with_curves=True)
+        predicted = predictive_depth_batch(*self.grid.values())
+        for i in (0, 17, 39):
+            args = (self.grid["etch_ion_flux"][i], self.grid["etch_neu_flux"][i], 0, 0,
+                    int(self.grid["n_cycles"][i]))
+            expected_depth, expected_points = etching_profile(*args, self.data, [3, 4], self.spectra)
+            self.assertAlmostEqual(depth[i], expected_depth)
+            np.testing.assert_allclose(profiles[i], expected_points, atol=1e-10)
+            self.assertAlmostEqual(predicted[i], predictive_depth(*args))
+
+    def test_missing_corners_fall_back_to_the_grid(self):
+        depth, profiles = etching_profile_batch([3.5, 3.5], 1.0, 0, 0, [2, 70], self.data, [3, 4], self.spectra,
+                                                with_curves=True)
+        expected_depth, expected_points = etching_profile(3.5, 1.0, 0, 0, 70, self.data, [3, 4], self.spectra)
+        self.assertAlmostEqual(depth[1], expected_depth)
+        np.testing.assert_allclose(profiles[1], expected_points, atol=1e-10)
+        self.assertAlmostEqual(expected_depth, etching_profile(3.5, 1.0, 0, 0, 70, self.data, [3, 4],
+                                                               grid=load_profile_grid("data/etching_only_db.json"),
+                                                               with_curve=False)[0])
+
+
+class ProfileGridTests(TestCase):
+    def setUp(self):
+        self.data = load_profile_db("data/etching_only_db.json")
+        self.grid = load_profile_grid("data/etching_only_db.json")
+
+    def test_paths_agree_at_corners(self):
+        spectra = SpectralLibrary.from_profiles(self.data)
+        for etch_ion, etch_neu, n_cycles in ((3.0, 0.5, 2), (4.0, 1.5, 3), (3.0, 1.5, 1), (4.0, 0.5, 4)):
+            key = curve_key(etch_ion, etch_neu, 0, 0, n_cycles)
+            expected_points = spectra.blend_curve([key], [1.0])
+            for grid in (None, self.grid):
+                for curves in (None, spectra):
+                    depth, points = etching_profile(etch_ion, etch_neu, 0, 0, n_cycles, self.data, [3, 4], curves,
+                                                    grid=grid)
+                    self.assertAlmostEqual(depth, n_cycles * self.data[key]["depth"])
+                    if curves is not None:
+                        np.testing.assert_allclose(points, smoothing(np.column_stack(
+                            [expected_points.real, expected_points.imag]), iterations=10), atol=1e-10)
+        # Out of the library both paths clamp n_cycles to its last curves
+        self.assertAlmostEqual(etching_profile(3.5, 1.0, 0, 0, 7, self.data, [3, 4], with_curve=False)[0],
+                               etching_profile(3.5, 1.0, 0, 0, 7, self.data, [3, 4], with_curve=False,
+                                               grid=self.grid)[0])
+
+    def test_axes(self):
+        self.assertEqual(len(self.grid), 20)
+        np.testing.assert_array_equal(self.grid.axes[0], [3, 4])
+        np.testing.assert_array_equal(self.grid.axes[4], [0, 1, 2, 3, 4])
+
+    def test_keys_are_normalized(self):
+        self.assertEqual(self.grid.key(3.0, 0.5, 0.0, 0, 4.0), "3_0.5_0_0_4")
+        self.assertIsNone(self.grid.key(3.5, 0.5, 0, 0, 4))
+        self.assertEqual(ProfileGrid(["3.0_0.5_0.0_0_4", "bad_key"]).key(3, 0.5, 0, 0, 4), "3.0_0.5_0.0_0_4")
+        self.assertEqual(curve_key(3.0, 0.5, 0.0, 0, 4.0), "3_0.5_0_0_4")
+
+    def test_grid_point_has_a_single_corner(self):
+        self.assertEqual(self.grid.corners(4, 1.5, 0, 0, 2), [("4_1.5_0_0_2", 1.0)])
+
+    def test_corners_bracket_n_cycles(self):
+        corners = dict(self.grid.corners(3.25, 1.0, 0, 0, 2.5))
+        self.assertEqual(len(corners), 8)
+        self.assertAlmostEqual(sum(corners.values()), 1.0)
+        self.assertAlmostEqual(corners["3_0.5_0_0_2"], 0.75 * 0.5 * 0.5)
+        self.assertAlmostEqual(corners["4_1.5_0_0_3"], 0.25 * 0.5 * 0.5)
+
+    def test_points_outside_the_grid_are_clamped(self):
+        self.assertEqual(self.grid.corners(5, 2, 1, 1, 70), [("4_1.5_0_0_4", 1.0)])
+        depth, points = etching_profile(3.5, 1.0, 0, 0, 70, self.data, [3, 4], grid=self.grid)
+        self.assertTrue(np.isfinite(depth))
+        self.assertGreater(np.ptp(points[:, 1]), 0)
+
+    def test_missing_corners_are_renormalized(self):
+        grid = ProfileGrid(["3_0.5_0_0_1", "4_0.5_0_0_1", "3_0.5_0_0_2"])
+        corners = dict(grid.corners(3.5, 0.5, 0, 0, 1.5))
+        self.assertEqual(set(corners), {"3_0.5_0_0_1", "4_0.5_0_0_1", "3_0.5_0_0_2"})
+        self.assertAlmostEqual(corners["3_0.5_0_0_2"], 1 / 3)
+        with self.assertRaises(KeyError):
+            ProfileGrid([]).corners(3, 0.5, 0, 0, 1)
+
+    def test_batch_matches_single_points(self):
+        spectra = load_spectra("data/etching_only_db.json")
+        grid = parameter_grid(np.linspace(3, 4, 3), [0.5, 1.2], 0, 0, [0.5, 2, 7])
+        depth, profiles = etching_profile_batch(*grid.values(), self.data, None, spectra, with_curves=True,
+                                                grid=self.grid)
+        for i in range(len(depth)):
+            args = [grid[name][i] for name in grid]
+            expected_depth, expected_points = etching_profile(*args, self.data, None, spectra, grid=self.grid)
+            self.assertAlmostEqual(depth[i], expected_depth)
+            np.testing.assert_allclose(profiles[i], expected_points, atol=1e-10)
+
+
+class ProfileCurveTests(TestCase):
+    def setUp(self):
+        call_command("load_profiles", "data/etching_only_db.json", "--batch-size", "7", stdout=open(os.devnull, "w"))
+        self.data = load_profile_db("data/etching_only_db.json")
+        self.library = ProfileLibrary("etching_only_db")
+
+    def test_one_row_per_curve(self):
+        self.assertEqual(ProfileCurve.objects.count(), 20)
+        curve = ProfileCurve.objects.get(library="etching_only_db", etch_ion_flux=3, etch_neu_flux=1.5,
+                                         dep_ion_flux=0, dep_neu_flux=0, n_cycles=2)
+        expected = np.asarray(self.data["3_1.5_0_0_2"]["points"])[:, :2]
+        self.assertEqual(curve.num_points, len(expected))
+        np.testing.assert_allclose(curve.get_points(), expected, rtol=1e-6)
+        self.assertEqual(curve.depth, self.data["3_1.5_0_0_2"]["depth"])
+
+    def test_reload_replaces_the_library(self):
+        version = self.library.version()
+        call_command("load_profiles", "data/etching_only_db.json", stdout=open(os.devnull, "w"))
+        self.assertEqual(ProfileCurve.objects.count(), 20)
+        self.assertNotEqual(self.library.version(), version)
+
+    def test_library_mapping(self):
+        self.assertEqual(sorted(self.library), sorted(self.data))
+        self.assertIn("3.0_0.5_0_0_4", self.library)
+        self.assertNotIn("3_0.5_0_0_70", self.library)
+        with self.assertNumQueries(1):
+            curves = self.library.fetch(["3_0.5_0_0_4", "4.0_0.5_0_0_4", "3_0.5_0_0_70", "not_a_key"])
+        self.assertEqual(sorted(curves), ["3_0.5_0_0_4", "4.0_0.5_0_0_4"])
+
+    def test_profile_fetches_its_corners_in_one_query(self):
+        grid = self.library.grid()
+        np.testing.assert_array_equal(grid.axes[4], [0, 1, 2, 3, 4])
+        with self.assertNumQueries(1):
+            depth, points = etching_profile(3.4, 0.8, 0, 0, 2.5, self.library, None, grid=grid)
+        expected_depth, expected_points = etching_profile(3.4, 0.8, 0, 0, 2.5, self.data, None,
+                                                          grid=load_profile_grid("data/etching_only_db.json"))
+        self.assertAlmostEqual(depth, expected_depth)
+        np.testing.assert_allclose(points, expected_points, atol=1e-3)
+        with self.assertNumQueries(1):
+            self.assertAlmostEqual(etching_profile(3.4, 0.8, 0, 0, 3, self.library, [3, 4])[0],
+                                   etching_profile(3.4, 0.8, 0, 0, 3, self.data, [3, 4])[0])
+
+    def test_dashboard_reads_the_database(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                override_settings(PROFILE_SOURCE="database", RENDER_CACHE_DIR=tmpdir):
+            response = self.client.get("/api/profile/", {"no_deposition": "on", "start_range": 1000,
+                                                         "end_range": 1100, "neutral_particle_flux": 500})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["profile"]["x"]), 390)
+            # Reloading the rows changes the ETag, there is no file time to go by
+            self.assertNotIn("Last-Modified", response)
+            etag = response["ETag"]
+            call_command("load_profiles", "data/etching_only_db.json", stdout=open(os.devnull, "w"))
+            response = self.client.get("/api/profile/", {"no_deposition": "on", "start_range": 1000,
+                                                         "end_range": 1100, "neutral_particle_flux": 500},
+                                       HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            response = self.client.post("/", {"no_deposition": "on", "start_range": 1000,
+                                              "end_range": 1100, "neutral_particle_flux": 500})
+            self.assertEqual(response.status_code, 200)
+
+    def test_requests_query_the_library_once(self):
+        params = {"no_deposition": "on", "start_range": 1000, "end_range": 1100, "neutral_particle_flux": 500}
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                override_settings(PROFILE_SOURCE="database", RENDER_CACHE_DIR=tmpdir):
+            self.client.get("/api/profile/", params)
+            # The version, then the corner curves; the grid is kept per process
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get("/api/profile/", params).status_code, 200)
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get("/", params).status_code, 200)
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get("/", dict(params, neutral_particle_flux="500")).status_code, 200)
+
+
+class AsyncViewTests(RenderDirTestCase):
+    params = {"no_deposition": "on", "start_range": 1000, "end_range": 1100,
+              "neutral_particle_flux": 500}
+
+    def test_async_views_match_sync_views(self):
+        self.assertEqual(self.client.post("/async/", self.params).context["image_url"],
+                         self.client.post("/", self.params).context["image_url"])
+        self.assertEqual(self.client.get("/api/async/profile/", self.params).json(),
+                         self.client.get("/api/profile/", self.params).json())
+
+    def test_full_queue_is_rejected(self):
+        release = threading.Event()
+        executor = BoundedExecutor(max_workers=1, max_queue=1)
+        executor.submit(release.wait)
+        executor.submit(release.wait)
+        with self.assertRaises(Overloaded):
+            executor.submit(release.wait)
+
+        with mock.patch("dashboard.views.get_executor", return_value=executor):
+            response = self.client.get("/api/async/profile/", self.params)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "1")
+            self.assertEqual(self.client.post("/async/", self.params).status_code, 503)
+        release.set()
+
+
+class RenderPoolTests(TestCase):
+    db_path = os.path.abspath("data/etching_only_db.json")
+
+    def setUp(self):
+        self.pool = RenderPool(processes=1, max_queue=0, db_paths=[self.db_path])
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def job(self, n_cycles):
+        return RenderJob(3.4, 0.8, 0, 0, n_cycles, self.db_path, [3, 4])
+
+    def test_render_matches_in_process_profile(self):
+        depth, svg = self.pool.render(self.job(3))
+        data = load_profile_db(self.db_path)
+        expected_depth, points = etching_profile(3.4, 0.8, 0, 0, 3, data, [3, 4], load_spectra(self.db_path),
+                                                 grid=load_profile_grid(self.db_path))
+        self.assertEqual(depth, expected_depth)
+        self.assertEqual(svg, points_to_svg(points))
+        self.assertEqual(self.pool.stats()["completed"], 1)
+
+    def test_identical_jobs_are_deduplicated_and_queue_is_bounded(self):
+        first = self.pool.submit(self.job(2))
+        self.assertIs(self.pool.submit(self.job(2)), first)
+        with self.assertRaises(QueueFull):
+            self.pool.submit(self.job(1))
+        first.result()
+        stats = self.pool.stats()
+        self.assertEqual(stats["deduplicated"], 1)
+        self.assertEqual(stats["rejected"], 1)
+
+
+class PrerenderGridTests(RenderDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manifest = os.path.join(self.tmpdir.name, "manifest.json")
+
+    def prerender(self, workers=1):
+        out = io.StringIO()
+        call_command("prerender_grid", "--step", "1000", "--mode", "etching-only", "--workers", str(workers),
+                     "--manifest", self.manifest, stdout=out, stderr=io.StringIO())
+        with open(self.manifest) as f:
+            return out.getvalue(), json.load(f)
+
+    def test_slider_windows(self):
+        windows = list(slider_windows(1000, etching_only=True))
+        self.assertEqual(windows[:2], [(0, 110), (1000, 1110)])
+        self.assertEqual(len(windows), 8)
+        self.assertTrue(all(0 < end - start <= 7000 for start, end in slider_windows(1000, etching_only=False)))
+
+    def test_grid_is_served_from_the_prerendered_cache(self):
+        out, manifest = self.prerender()
+        # Windows past the end of the recording share one operating point
+        self.assertIn("rendering 7", out)
+        self.assertEqual(manifest["renderer_version"], RENDERER_VERSION)
+        self.assertEqual(len(manifest["renders"]), 7)
+        renders = {params["start_range"]: render for render in manifest["renders"] for params in render["params"]}
+        self.assertEqual(sorted(renders), list(range(0, 7001, 1000)))
+        files = sorted(os.listdir(self.render_dir))
+
+        response = self.client.post("/", {"no_deposition": "on", "start_range": 1000, "end_range": 1110,
+                                          "neutral_particle_flux": 500})
+        self.assertTrue(response.context["image_url"].endswith(renders[1000]["image"]))
+        self.assertAlmostEqual(response.context["actual_depth"], renders[1000]["actual_depth"])
+        self.assertEqual(sorted(os.listdir(self.render_dir)), files)
+
+        out, _ = self.prerender(workers=0)
+        self.assertIn("rendering 0", out)
+
+        # Changing the profile math renders the whole grid again
+        with mock.patch("dashboard.operating_points.RENDERER_VERSION", RENDERER_VERSION + 1):
+            out, _ = self.prerender(workers=0)
+        self.assertIn("rendering 7", out)
+
+
+class StartupTests(TestCase):
+    def test_etchingsim_does_not_import_heavy_modules(self):
+        code = ("import sys; sys.path.append('etchingsim'); import etchingsim; "
+                "print(','.join(m for m in ('vtk', 'matplotlib', 'pandas') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+class BenchmarkTests(TestCase):
+    def test_regression_fails_the_run(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            baseline_path = os.path.join(tmpdir, "baseline.json")
+            command = [sys.executable, "test/benchmarks.py", "smoothing", "--repeat", "1", "--baseline", baseline_path]
+            subprocess.run(command + ["--save"], capture_output=True, check=True)
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            self.assertIn("smoothing", baseline["results"])
+
+            baseline["results"]["smoothing"] /= 100
+            with open(baseline_path, "w") as f:
+                json.dump(baseline, f)
+            result = subprocess.run(command, capture_output=True, text=True)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("REGRESSION", result.stdout)
+
+
+class VtpIngestTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_points_match_vtk_accessors(self):
+        poly_data = read_vtp("data/run_4.vtp")
+        vtk_points = poly_data.GetPoints()
+        expected = [vtk_points.GetPoint(i)[:2] for i in range(vtk_points.GetNumberOfPoints())]
+        points, depth = read_profile("data/run_4.vtp")
+        np.testing.assert_array_equal(points, expected)
+        bounds = poly_data.GetBounds()
+        self.assertEqual(depth, bounds[3] - bounds[2])
+
+    def test_ingest_directory(self):
+        db_path = os.path.join(self.tmpdir.name, "db.json")
+        with open(db_path, "w") as f:
+            json.dump({"existing": {"points": [[0.0, 0.0, 0.0]], "depth": 1.0}}, f)
+        count = ingest_vtp_files(["data"], db_path, manifest={"run_4.vtp": "3_0.5_0_0_4"},
+                                 workers=2, flush_every=1)
+        self.assertEqual(count, 2)
+        with open(db_path) as f:
+            data = json.load(f)
+        self.assertEqual(sorted(data), ["3_0.5_0_0_4", "existing", "run_19"])
+        self.assertEqual(len(data["3_0.5_0_0_4"]["points"]), 164)
+        self.assertEqual(len(data["run_19"]["points"][0]), 3)
+
+    def test_ingest_journals_and_rewrites_the_db_once(self):
+        db_path = os.path.join(self.tmpdir.name, "db.json")
+        # Left behind by an interrupted ingest, its last record cut off
+        with open(journal_path(db_path), "w") as f:
+            f.write(json.dumps(["interrupted", {"points": [[0.0, 0.0, 0.0]], "depth": 2.0}]) + "\n")
+            f.write('["cut", {"points": [[0.0')
+        with mock.patch("vtp_ingest.write_json_atomic", wraps=vtp_ingest.write_json_atomic) as write:
+            ingest_vtp_files(["data"], db_path, workers=1, flush_every=1)
+        write.assert_called_once()
+        self.assertFalse(os.path.exists(journal_path(db_path)))
+        with open(db_path) as f:
+            self.assertEqual(sorted(json.load(f)), ["interrupted", "run_19", "run_4"])
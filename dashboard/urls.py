@@ -3,4 +3,10 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
+    path('renders/<str:name>', views.render_view, name='render'),
+    path('async/', views.dashboard_view_async, name='dashboard_async'),
+    path('api/profile/', views.profile_api, name='profile_api'),
+    path('api/async/profile/', views.profile_api_async, name='profile_api_async'),
+    path('api/flux/', views.flux_api, name='flux_api'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
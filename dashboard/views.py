@@ -1,83 +1,364 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import math
 import os
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlencode
 import numpy as np
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render
-from etchingsim import etching_data_1, predictive_depth, generate_etching_profile
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_http_methods
+from etchingsim import etching_profile, generate_etching_profile
+from etchingsim import file_version, load_flux_pyramid, resolve_profile_db
+from etchingsim import QueueFull, RenderJob, get_render_pool
+from etchingsim import cache_stats, timing
 from django.conf import settings
-import json
+from .executor import Overloaded, get_executor
+from .operating_points import (CALLIBRATED_DEPTH, csv_file_path, library_version, operating_point, profile_db_path,
+                               profile_library, render_cache, render_key)
 
-def count_cycle(sequence, filter = 4800):
-    count = 0
-    for i in range(0, len(sequence) - 1):
-        if sequence[i+1] > filter and sequence[i] <= filter:
-            count += 1
-    return count
+RENDER_NAME = re.compile(r"[0-9a-f]{64}\.svg")
 
-def threshold_filter(sequence, filter= 2500):
-    new_seq = []
-    for val in sequence:
-        if val > filter:
-            new_seq.append(val)
-    return np.array(new_seq)
 
-def dashboard_view(request):
+def _render_pool():
+    profile_db_paths = [os.path.join(settings.BASE_DIR, 'data', name)
+                        for name in ('etching_db_new.json', 'etching_only_db.json')]
+    return get_render_pool(settings.RENDER_WORKERS, settings.RENDER_MAX_QUEUE, profile_db_paths)
+
+
+def _render_profile(point, svg_path):
     """
-    Renders the dashboard page with data and handles user input.
+    Renders the profile of an operating point to svg_path, in the render
+    worker pool when RENDER_WORKERS is set, and returns its metadata.
     """
-    configs = json.load(open("dashboard/config.json"))
-    data = json.load(open("data/etching_db_new.json"))
-    # Define your backend data
-    
-    # variables
-    n_cycles = 20
-    average_ion_flux = 0.0
-    actual_depth = 100
-    neutral_particle_flux = request.POST.get('neutral_particle_flux', 500)
-    ion_deposition_flux = 3
-    neu_deposition_flux = 2
-    no_deposition = request.POST.get('no_deposition')
-    start_range = int(request.POST.get('start_range', 1000))
-    end_range = int(request.POST.get('end_range', 7000)) #len(ion_flux)))
-    max_limit = 7000
-    etching_limits = [2,4]
-    
-    if (no_deposition):
-        ion_deposition_flux = 0
-        neu_deposition_flux = 0
-        data = json.load(open("data/etching_only_db.json"))
-        max_limit = start_range + 110
-        etching_limits = [3,4]
-    
-    #results
-    predicted_depth = 100
-    
-    # Path to the image files
-    image_path = configs["svg_file"]
-    csv_file_path = os.path.join(settings.BASE_DIR, 'data', 'etchingdata.csv')
-    input_vtp_file = os.path.join(settings.BASE_DIR, 'data', configs["vtp_file"])
-    output_svg_file = os.path.join("dashboard", 'static', configs["svg_file"])
-    
-    # Calculate results
-    actual_depth, ion_flux, time_stamp = etching_data_1(csv_file_path)
-    selected_ion_flux = ion_flux[start_range:end_range]
-    average_ion_flux = np.mean(threshold_filter(selected_ion_flux))
-    n_cycles = count_cycle(selected_ion_flux)
-    predicted_depth = predictive_depth(average_ion_flux/1000, float(neutral_particle_flux)/1000, ion_deposition_flux, neu_deposition_flux, n_cycles)
+    profile_db_path = point['profile_db_path']
+    if settings.RENDER_WORKERS:
+        with timing.stage('render_pool'):
+            depth, svg = _render_pool().render(RenderJob(
+                point['etch_ion_flux'], point['etch_neu_flux'], point['dep_ion_flux'], point['dep_neu_flux'],
+                point['n_cycles'], profile_db_path, point['etching_limits']))
+        with open(svg_path, 'wb') as f:
+            f.write(svg)
+        return {'depth': depth}
+    data, spectra, grid = profile_library(profile_db_path, point['db_version'])
+    return {
+        'depth': generate_etching_profile(point['etch_ion_flux'], point['etch_neu_flux'], point['dep_ion_flux'], point['dep_neu_flux'], point['n_cycles'], data, svg_path, point['etching_limits'], spectra, grid)
+    }
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _validators(request, names, profile_db=True):
+    """
+    Returns (etag, last_modified) of a GET request whose response only
+    depends on the query parameters in names and on the versions of the
+    CSV and, with profile_db, of the profile database. They are computed
+    once per request, from file metadata only, so a 304 costs no more
+    than a few stat calls.
+
+    Both are None for other methods, when a data file is missing or when
+    an async view would need to query the ProfileCurve table, which
+    disables conditional responses.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None, None
+    if not hasattr(request, '_validators'):
+        request._validators = (None, None)
+        params = request.GET
+        paths = [csv_file_path()]
+        if profile_db:
+            paths.append(profile_db_path(params))
+        from_database = profile_db and settings.PROFILE_SOURCE == 'database'
+        if from_database and _in_event_loop():
+            return request._validators
+        try:
+            versions = [file_version(paths[0])]
+            mtime = os.path.getmtime(paths[0])
+            if profile_db:
+                request.db_version = library_version(paths[1])
+                versions.append(request.db_version)
+                mtime = max(mtime, os.path.getmtime(resolve_profile_db(paths[1])))
+        except OSError:
+            return request._validators
+        key = json.dumps([request.path, [params.get(name) for name in names], versions])
+        # Reloading the ProfileCurve rows doesn't change any file, only the ETag
+        last_modified = None if from_database else datetime.fromtimestamp(mtime, tz=timezone.utc)
+        request._validators = (hashlib.sha256(key.encode()).hexdigest(), last_modified)
+    return request._validators
+
+
+def _conditional(*names, profile_db=True):
+    """
+    Decorates a view to answer If-None-Match and If-Modified-Since with a
+    304 before the view runs, see _validators.
+    """
+    return condition(etag_func=lambda request, *args, **kwargs: _validators(request, names, profile_db)[0],
+                     last_modified_func=lambda request, *args, **kwargs: _validators(request, names, profile_db)[1])
+
+
+DASHBOARD_PARAMS = ('start_range', 'end_range', 'neutral_particle_flux', 'no_deposition')
+
+
+def _dashboard_context(params, db_version=None):
+    """
+    Computes the dashboard results and renders the profile, returning the
+    template context.
+    """
+    point = operating_point(params, db_version)
+
+    # The chart fetches the downsampled flux separately, the URL carries the
+    # CSV version so the response can be cached
+    flux_url = reverse('flux_api') + '?' + urlencode({
+        'start_range': point['start_range'],
+        'end_range': point['end_range'],
+        'v': file_version(point['csv_file_path']),
+    })
     
-    # Generate images
-    callibrated_depth =  60/8539.88
-    actual_depth = callibrated_depth*generate_etching_profile(average_ion_flux/1000, float(neutral_particle_flux)/1000, ion_deposition_flux, neu_deposition_flux, n_cycles, data, output_svg_file, etching_limits)
+    # Generate images, identical inputs are served from the render cache
+    cache = render_cache()
+    key = render_key(cache, point)
+    with timing.stage('render'):
+        rendered = cache.get_or_render(key, lambda svg_path: _render_profile(point, svg_path))
+    actual_depth = CALLIBRATED_DEPTH*rendered['depth']
+    image_url = reverse('render', args=[cache.filename(key)])
     
-    context = {
-        'ion_flux': selected_ion_flux.tolist(), # Convert numpy array to list for rendering
-        'start_range': start_range,
-        'end_range': end_range,
-        'average_ion_flux': average_ion_flux,
-        'neutral_particle_flux': neutral_particle_flux,
-        'n_cycles': n_cycles,
-        'image_path': image_path,
+    return {
+        'flux_url': flux_url,
+        'start_range': point['start_range'],
+        'end_range': point['end_range'],
+        'average_ion_flux': point['average_ion_flux'],
+        'neutral_particle_flux': point['neutral_particle_flux'],
+        'n_cycles': point['n_cycles'],
+        'image_url': image_url,
         'actual_depth' : actual_depth,
-        'predicted_depth' : predicted_depth,
-        'max_limit' : max_limit
+        'predicted_depth' : point['predicted_depth'],
+        'max_limit' : point['max_limit']
     }
-    
-    return render(request, 'dashboard.html', context)
\ No newline at end of file
+
+
+def _request_params(request):
+    return request.POST if request.method == 'POST' else request.GET
+
+
+def _request_db_version(request):
+    # Set by _validators, so the version is queried once per request
+    return getattr(request, 'db_version', None)
+
+
+def _revalidate(request, response):
+    # GET results may be stored, but only reused after a conditional request
+    if request.method == 'GET':
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+@_conditional(*DASHBOARD_PARAMS)
+def dashboard_view(request):
+    """
+    Renders the dashboard page with data and handles user input, given as
+    GET parameters by the form (or POSTed). Unchanged GET results are
+    answered with a 304.
+    """
+    try:
+        context = _dashboard_context(_request_params(request), _request_db_version(request))
+    except QueueFull:
+        return _overloaded_response()
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e), content_type='text/plain')
+    with timing.stage('template'):
+        return _revalidate(request, render(request, 'dashboard.html', context))
+
+
+def _overloaded_response(json=False):
+    if json:
+        response = JsonResponse({'error': 'Server is overloaded, retry later.'}, status=503)
+    else:
+        response = HttpResponse('Server is overloaded, retry later.', status=503, content_type='text/plain')
+    response['Retry-After'] = '1'
+    return response
+
+
+@_conditional(*DASHBOARD_PARAMS)
+async def dashboard_view_async(request):
+    """
+    Async variant of dashboard_view. The profile generation and file I/O run
+    in the bounded dashboard executor, and requests beyond its queue get a
+    503 instead of waiting.
+    """
+    try:
+        context = await get_executor().run(_dashboard_context, _request_params(request),
+                                             _request_db_version(request))
+    except (Overloaded, QueueFull):
+        return _overloaded_response()
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e), content_type='text/plain')
+    with timing.stage('template'):
+        return _revalidate(request, render(request, 'dashboard.html', context))
+
+
+def _finite(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _profile_params(request):
+    params = _request_params(request)
+    with_curve = params.get('curve', '1').lower() not in ('0', 'false', 'no')
+    return params, with_curve, _request_db_version(request)
+
+
+def _profile_payload(params, with_curve, db_version=None):
+    point = operating_point(params, db_version)
+    data, spectra, grid = profile_library(point['profile_db_path'], point['db_version'])
+
+    depth, points = etching_profile(point['etch_ion_flux'], point['etch_neu_flux'], point['dep_ion_flux'], point['dep_neu_flux'], point['n_cycles'], data, point['etching_limits'], spectra, with_curve, grid)
+    payload = {
+        'start_range': point['start_range'],
+        'end_range': point['end_range'],
+        'average_ion_flux': _finite(point['average_ion_flux']),
+        'n_cycles': point['n_cycles'],
+        'predicted_depth': _finite(point['predicted_depth']),
+        'depth': _finite(depth),
+        'calibrated_depth': _finite(CALLIBRATED_DEPTH*depth),
+    }
+    if points is not None:
+        points = np.round(np.asarray(points, dtype=np.float64), 4)
+        payload['profile'] = {'x': points[:, 0].tolist(), 'y': points[:, 1].tolist()}
+    return payload
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@_conditional(*DASHBOARD_PARAMS, 'curve')
+def profile_api(request):
+    """
+    Returns the dashboard results as JSON without rendering HTML or SVG.
+
+    Accepts the dashboard parameters, plus curve=0 to skip the profile.
+    The profile is returned as x and y arrays rounded to 4 decimals.
+    Malformed parameters are answered with a 400.
+    """
+    try:
+        payload = _profile_payload(*_profile_params(request))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _revalidate(request, JsonResponse(payload))
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@_conditional(*DASHBOARD_PARAMS, 'curve')
+async def profile_api_async(request):
+    """
+    Async variant of profile_api, running in the bounded dashboard executor.
+    """
+    try:
+        payload = await get_executor().run(_profile_payload, *_profile_params(request))
+    except Overloaded:
+        return _overloaded_response(json=True)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _revalidate(request, JsonResponse(payload))
+
+
+@require_http_methods(['GET'])
+@_conditional('start_range', 'end_range', 'points', profile_db=False)
+def flux_api(request):
+    """
+    Returns the ion flux of the selected range downsampled to at most
+    `points` points (FLUX_DISPLAY_POINTS by default), keeping the peaks.
+
+    The x values count samples from the start of the range, starting at 1.
+    Responses only depend on the query and the CSV. When the URL carries
+    the current CSV version as v, as the dashboard's does, clients may
+    cache them; other responses have to be revalidated.
+    """
+    params = request.GET
+    csv_path = csv_file_path()
+    try:
+        start_range = int(params.get('start_range', 1000))
+        end_range = int(params.get('end_range', 7000))
+        num_points = min(max(int(params.get('points', settings.FLUX_DISPLAY_POINTS)), 2), 10000)
+    except ValueError:
+        return JsonResponse({'error': 'start_range, end_range and points must be integers.'}, status=400)
+
+    positions, values = load_flux_pyramid(csv_path).window(start_range, end_range, num_points)
+    response = JsonResponse({
+        'start_range': start_range,
+        'end_range': end_range,
+        'x': (positions - start_range + 1).tolist(),
+        'y': values.tolist(),
+    })
+    if params.get('v') == file_version(csv_path):
+        response['Cache-Control'] = 'public, max-age=86400'
+        return response
+    return _revalidate(request, response)
+
+
+def _render_mtime(name):
+    if not RENDER_NAME.fullmatch(name):
+        return None
+    try:
+        return os.path.getmtime(os.path.join(render_cache().root, name))
+    except OSError:
+        return None
+
+
+def _render_etag(request, name):
+    return os.path.splitext(name)[0] if _render_mtime(name) is not None else None
+
+
+def _render_last_modified(request, name):
+    mtime = _render_mtime(name)
+    return None if mtime is None else datetime.fromtimestamp(mtime, tz=timezone.utc)
+
+
+@condition(etag_func=_render_etag, last_modified_func=_render_last_modified)
+def render_view(request, name):
+    """
+    Serves a cached profile render. Renders are content-addressed and never
+    change once written, so they can be cached by clients indefinitely, and
+    their name serves as ETag.
+    """
+    if not RENDER_NAME.fullmatch(name):
+        raise Http404("Unknown render")
+    try:
+        response = FileResponse(open(os.path.join(render_cache().root, name), 'rb'),
+                                content_type='image/svg+xml')
+    except FileNotFoundError:
+        raise Http404("Unknown render")
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+def metrics_view(request):
+    """
+    Returns the stage timing histograms and the cache and render pool
+    counters as JSON. Only served to requests carrying METRICS_TOKEN in
+    the X-Metrics-Token header or, without a token, to METRICS_ALLOWED_IPS,
+    which is unreliable behind a reverse proxy.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), settings.METRICS_TOKEN)
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed:
+        raise Http404("Unknown page")
+    return JsonResponse({
+        'timing_enabled': timing.is_enabled(),
+        'stages': timing.histograms(),
+        'profile_db_cache': cache_stats(),
+        'render_pool': _render_pool().stats() if settings.RENDER_WORKERS else None,
+    })
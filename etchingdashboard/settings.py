@@ -31,6 +31,54 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Content-addressed cache of rendered profile images
+RENDER_CACHE_DIR = os.path.join(MEDIA_ROOT, 'renders')
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Worker threads of the async dashboard views, and how many more requests
+# may wait for one before the views answer 503
+DASHBOARD_MAX_CONCURRENCY = 4
+DASHBOARD_MAX_QUEUE = 16
+
+# Worker processes rendering profiles, 0 renders in the request thread.
+# RENDER_MAX_QUEUE bounds the jobs waiting for a worker process.
+RENDER_WORKERS = 0
+RENDER_MAX_QUEUE = 32
+
+# Maximum number of points of the ion flux chart, longer ranges are
+# downsampled keeping each bucket's minimum and maximum
+FLUX_DISPLAY_POINTS = 500
+
+# Where the dashboard reads profile curves from: 'files' (the JSON or binary
+# profile databases in data/) or 'database' (ProfileCurve rows loaded with
+# the load_profiles command). Render worker processes always read files.
+PROFILE_SOURCE = 'files'
+
+# Per-stage request timing (Server-Timing headers, the dashboard.timing log
+# and the metrics/ endpoint). With METRICS_TOKEN set the endpoint requires
+# it in the X-Metrics-Token header, otherwise it is served to
+# METRICS_ALLOWED_IPS only. Behind a reverse proxy REMOTE_ADDR is the
+# proxy's address, so set a token there.
+TIMING_ENABLED = True
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = None
+
+# The timing middleware logs one JSON line per request on dashboard.timing
+# at INFO, which Python's fallback handler would drop
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'timing': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'dashboard.timing': {'handlers': ['timing'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Define the path to your utils directory
 UTILS_DIR = os.path.join(BASE_DIR, 'etchingsim')
 
@@ -58,6 +106,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dashboard.middleware.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
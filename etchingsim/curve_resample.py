@@ -0,0 +1,38 @@
+import numpy as np
+
+RESAMPLE_POINTS = 200
+
+
+def arc_length(points):
+    """
+    Returns the cumulative arc length at every point of a (n, 2) curve,
+    starting at 0.
+    """
+    segments = np.hypot(*np.diff(points, axis=0).T)
+    return np.concatenate([[0.0], np.cumsum(segments)])
+
+
+def resample_arc_length(points, num_points=RESAMPLE_POINTS):
+    """
+    Resamples a curve to num_points points evenly spaced along its arc length.
+
+    The first and last points are kept. Curves with fewer than two distinct
+    points are repeated to num_points copies of their first point.
+
+    Args:
+        points (np.ndarray): Points of the curve, shape (n, 2) or (n, 3).
+        num_points (int): Number of points of the resampled curve.
+
+    Returns:
+        np.ndarray: The resampled points, shape (num_points, 2), or (0, 2)
+        for an empty curve.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) == 0:
+        return np.zeros((0, 2))
+    points = points.reshape(len(points), -1)[:, :2]
+    s = arc_length(points)
+    if s[-1] == 0:
+        return np.repeat(points[:1], num_points, axis=0)
+    targets = np.linspace(0.0, s[-1], num_points)
+    return np.column_stack([np.interp(targets, s, points[:, 0]), np.interp(targets, s, points[:, 1])])
@@ -1,18 +1,60 @@
-from vtp_to_svg import create_curve
-import matplotlib.pyplot as plt
+from vtp_to_svg import blend_points, blend_spectra, points_to_svg, smoothing_array
+from spectral_library import CompressedSpectralLibrary, SpectralLibrary, compression_report
+import fft_reconstruct
+from profile_db import (load_json, load_profile_db, load_profile_grid, load_spectra, profile_db_version, cache_stats,
+                        file_version, resolve_profile_db)
+from profile_grid import ProfileGrid, parse_key
+from flux_data import DEFAULT_ROWS, load_flux_series
+from flux_stats import count_cycle, threshold_filter, load_flux_index
+from flux_pyramid import load_flux_pyramid
+from render_cache import get_render_cache
+from render_pool import QueueFull, RenderJob, get_render_pool
 import numpy as np
-import pandas as pd
-import vtk
+import logging
+import timing
 
+logger = logging.getLogger(__name__)
 
-def etching_data_1(csv_path='data.csv'):
-    df = pd.read_csv(csv_path)
-    data_rows = df.to_numpy()
-    target_rows = np.array(data_rows[0:4])
-    plottable = np.average(target_rows, axis=0)
+# Version of the profile math, part of the render cache keys. Bump it with
+# any change to the blending, resampling or smoothing of the profiles, as
+# renders are served as immutable and would otherwise outlive the change.
+RENDERER_VERSION = 1
+
+# The simulation API, and the helpers of the other etchingsim modules the
+# dashboard imports through this module
+__all__ = [
+    "etching_data_1", "find_interval_and_weight", "find_weight", "get_y_distance", "predictive_depth",
+    "curve_key", "fetch_curves", "retrieve_curve", "etching_profile", "generate_etching_profile",
+    "parameter_grid", "predictive_depth_batch", "etching_profile_batch", "RENDERER_VERSION",
+    # Re-exported
+    "CompressedSpectralLibrary", "SpectralLibrary", "compression_report",
+    "cache_stats", "file_version", "load_json", "load_profile_db", "load_profile_grid", "load_spectra",
+    "profile_db_version", "resolve_profile_db",
+    "ProfileGrid", "parse_key",
+    "DEFAULT_ROWS", "load_flux_series", "count_cycle", "threshold_filter", "load_flux_index", "load_flux_pyramid",
+    "get_render_cache", "QueueFull", "RenderJob", "get_render_pool",
+    "timing",
+]
+
+
+@timing.timed("flux_data")
+def etching_data_1(csv_path='data.csv', rows=DEFAULT_ROWS, time_step=250):
+    """
+    Returns the depth, ion flux and time stamps averaged over the selected
+    rows of a flux recording.
+
+    Args:
+        csv_path (str): Path to the flux recording.
+        rows (tuple): (start, stop) range of the rows to average.
+        time_step (float): Spacing between samples in ms.
+
+    Returns:
+        tuple: (depth, flux_with_time, time_stamp)
+    """
+    plottable = load_flux_series(csv_path, rows)
     depth = plottable[0]
     flux_with_time = plottable[1:]
-    time_stamp = [250 * (i+1) for i in range(len(flux_with_time))]
+    time_stamp = time_step * np.arange(1, len(flux_with_time) + 1)
     return depth, flux_with_time, time_stamp
 
 
@@ -54,12 +96,11 @@ def find_interval_and_weight(intervals, x):
 
 
 def find_weight(intervals, x):
-    # if x < intervals[0] :
-    #     return -1
-    # if x > intervals[-1]:
-    #     return intervals[-1], intervals[-1], -1
-
-    return (x - intervals[0])/(intervals[-1] - intervals[0])
+    """
+    Returns the weight of the upper end of intervals at x, clamped to
+    [0, 1] like ProfileGrid does outside its axes.
+    """
+    return np.clip((x - intervals[0])/(intervals[-1] - intervals[0]), 0, 1)
 
 
 def get_y_distance(poly_data):
@@ -101,20 +142,64 @@ def predictive_depth(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n
     return depth_0 + (k_etch_ion * etch_ion_flux + k_etch_neu * etch_neu_flux - k_dep_ion * dep_ion_flux - k_dep_neu * dep_neu_flux) * n_cycles
 
 
+def curve_key(m1, m2, m3, m4, n_cycles):
+    m1, m2, m3, m4, n_cycles = (_key_number(value) for value in (m1, m2, m3, m4, n_cycles))
+    return f"{m1}_{m2}_{m3}_{m4}_{n_cycles}"
+
+
+def fetch_curves(data, keys):
+    """
+    Narrows data to the curves of keys. A database-backed profile source
+    provides fetch(keys), which reads only those curves in one query; other
+    mappings are returned as they are.
+    """
+    fetch = getattr(data, "fetch", None)
+    return fetch(keys) if fetch is not None else data
+
+
 def retrieve_curve(m1, m2, m3, m4, n_cycles, data):
-    print(f"{m1}_{m2}_{m3}_{m4}_{n_cycles}")
-    if f"{m1}_{m2}_{m3}_{m4}_{n_cycles}" in data:
-        return data[f"{m1}_{m2}_{m3}_{m4}_{n_cycles}"]
+    key = curve_key(m1, m2, m3, m4, n_cycles)
+    logger.debug("retrieving curve %s", key)
+    if key in data:
+        return data[key]
     else:
-        print(f"{m1}_{m2}_{m3}_{m4}_{n_cycles} point not found")
+        logger.warning("%s point not found", key)
         return {"points": [(0, 0) for i in range(0, 100)]}
 
 
-def generate_etching_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, svg_path, etching_limits):
+def etching_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, etching_limits, spectra=None, with_curve=True, grid=None):
+    """
+    Blends the four library curves around the operating point.
+
+    When spectra (the SpectralLibrary of data) holds all four curves, the
+    profile is one weighted sum of their stored coefficients followed by a
+    single inverse transform instead of three pairwise transforms.
+
+    With a grid (the ProfileGrid of data) the curves bracketing the operating
+    point along all five parameters, n_cycles included, are blended with
+    multilinear weights and etching_limits is not used. Without one the
+    corners are etching_limits x (0.5, 1.5) with the same weights, the lower
+    corner getting 1 - t; when one of them is missing from data the point
+    is located on the grid of data instead.
+
+    Returns:
+        tuple: (depth, points), points is None when with_curve is False.
+    """
+    if grid is not None:
+        return _grid_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, grid,
+                             spectra, with_curve)
+
     w1 = find_weight(etching_limits, etch_ion_flux)
     w2 = find_weight([0.5, 1.5], etch_neu_flux)
     
     low, up = etching_limits[0], etching_limits[1]
+    keys = [curve_key(etch_ion, etch_neu, dep_ion_flux, dep_neu_flux, n_cycles)
+            for etch_neu in (0.5, 1.5) for etch_ion in (low, up)]
+    curves = fetch_curves(data, keys)
+    if not all(key in curves for key in keys):
+        return _grid_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data,
+                             _data_grid(data), spectra, with_curve)
+    data = curves
     q1 = retrieve_curve(low, 0.5, dep_ion_flux, dep_neu_flux,
                         n_cycles, data)
     q2 = retrieve_curve(up, 0.5, dep_ion_flux, dep_neu_flux,
@@ -124,10 +209,177 @@ def generate_etching_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu
     q4 = retrieve_curve(up, 1.5, dep_ion_flux, dep_neu_flux,
                         n_cycles, data)
 
-    create_curve(q1["points"], q2["points"], q3["points"],
-                 q4["points"], w1, w2, svg_path)
+    points = None
+    if with_curve:
+        with timing.stage("blend"):
+            if spectra is not None and all(key in spectra for key in keys):
+                weights = [(1 - w1) * (1 - w2), w1 * (1 - w2), (1 - w1) * w2, w1 * w2]
+                points = blend_spectra(spectra, keys, weights)
+            else:
+                # blend_points gives its first curve the weight it is passed
+                points = blend_points(q1["points"], q2["points"], q3["points"],
+                                      q4["points"], 1 - w1, 1 - w2)
     d1 = q1["depth"]*n_cycles
     d2 = q2["depth"]*n_cycles
     d3 = q3["depth"]*n_cycles
     d4 = q4["depth"]*n_cycles
-    return d1 * w1 * w2 + d2 * (1 - w1) * w2 + d3 * (1 - w2) * w1 + d4 * (1 - w1) * (1 - w2)
+    return d1 * (1 - w1) * (1 - w2) + d2 * w1 * (1 - w2) + d3 * (1 - w1) * w2 + d4 * w1 * w2, points
+
+
+def _data_grid(data):
+    grid = getattr(data, "grid", None)
+    return grid() if grid is not None else ProfileGrid.from_profiles(data)
+
+
+def _grid_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, grid, spectra, with_curve):
+    corners = grid.corners(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles)
+    keys = [key for key, _ in corners]
+    weights = [weight for _, weight in corners]
+    data = fetch_curves(data, keys)
+    depth = n_cycles * sum(weight * data[key]["depth"] for key, weight in corners)
+
+    points = None
+    if with_curve:
+        with timing.stage("blend"):
+            if spectra is None or not all(key in spectra for key in keys):
+                spectra = SpectralLibrary.from_profiles({key: data[key] for key in keys})
+            points = blend_spectra(spectra, keys, weights)
+    return depth, points
+
+
+def generate_etching_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, svg_path, etching_limits, spectra=None, grid=None):
+    """
+    Writes the blended profile to svg_path and returns the blended depth.
+    """
+    depth, points = etching_profile(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux,
+                                    n_cycles, data, etching_limits, spectra, grid=grid)
+    points_to_svg(points, svg_path)
+    return depth
+
+
+def parameter_grid(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles):
+    """
+    Returns the full grid of operating points spanned by the given axes.
+
+    Each argument is a scalar or a 1-D sequence of values. The result is a
+    dict of flattened arrays, one entry per grid point.
+    """
+    axes = [np.atleast_1d(np.asarray(axis, dtype=np.float64)) for axis in
+            (etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles)]
+    grid = np.meshgrid(*axes, indexing="ij")
+    names = ["etch_ion_flux", "etch_neu_flux", "dep_ion_flux", "dep_neu_flux", "n_cycles"]
+    return {name: values.ravel() for name, values in zip(names, grid)}
+
+
+def predictive_depth_batch(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles):
+    """
+    Evaluates predictive_depth for broadcastable arrays of operating points.
+    """
+    arrays = np.broadcast_arrays(*[np.asarray(a, dtype=np.float64) for a in
+                                   (etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles)])
+    return predictive_depth(*arrays)
+
+
+def _key_number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def etching_profile_batch(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, etching_limits,
+                          spectra=None, with_curves=False, chunk_size=4096, grid=None):
+    """
+    Evaluates etching_profile for many operating points in one vectorized pass.
+
+    The arguments are broadcast against each other. Corner curves are looked
+    up once per distinct (dep_ion_flux, dep_neu_flux, n_cycles) combination;
+    points whose corners are missing from data are located on the grid of
+    data, as in etching_profile. With a grid every point is located on it.
+
+    Returns:
+        tuple: (depth, profiles). depth has the broadcast shape, profiles is
+        None unless with_curves is set, in which case it has that shape
+        followed by (num_points, 2).
+    """
+    etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles = np.broadcast_arrays(
+        *[np.asarray(a, dtype=np.float64) for a in
+          (etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles)])
+    shape = etch_ion_flux.shape
+    if with_curves and spectra is None:
+        spectra = SpectralLibrary.from_profiles(data)
+    if grid is not None:
+        return _grid_profile_batch(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, grid,
+                                   spectra, with_curves, chunk_size)
+
+    w1 = find_weight(etching_limits, etch_ion_flux.ravel())
+    w2 = find_weight([0.5, 1.5], etch_neu_flux.ravel())
+    weights = np.stack([(1 - w1) * (1 - w2), w1 * (1 - w2), (1 - w1) * w2, w1 * w2], axis=1)
+
+    low, up = etching_limits[0], etching_limits[1]
+    corners = [(low, 0.5), (up, 0.5), (low, 1.5), (up, 1.5)]
+    combos = np.stack([dep_ion_flux.ravel(), dep_neu_flux.ravel(), n_cycles.ravel()], axis=1)
+    unique_combos, inverse = np.unique(combos, axis=0, return_inverse=True)
+    corner_depth = np.full((len(unique_combos), 4), np.nan)
+    corner_rows = np.full((len(unique_combos), 4), -1)
+    for i, (dep_ion, dep_neu, cycles) in enumerate(unique_combos):
+        for j, (etch_ion, etch_neu) in enumerate(corners):
+            key = curve_key(_key_number(etch_ion), _key_number(etch_neu), _key_number(dep_ion),
+                            _key_number(dep_neu), _key_number(cycles))
+            if key in data:
+                corner_depth[i, j] = data[key]["depth"]
+                if spectra is not None and key in spectra:
+                    corner_rows[i, j] = spectra.index[key]
+
+    inverse = inverse.ravel()
+    depth = n_cycles.ravel() * np.sum(weights * corner_depth[inverse], axis=1)
+    missing = np.any(np.isnan(corner_depth[inverse]), axis=1)
+    fallback = None
+    if np.any(missing):
+        fallback = _grid_profile_batch(*(a.ravel()[missing] for a in (etch_ion_flux, etch_neu_flux, dep_ion_flux,
+                                                                      dep_neu_flux, n_cycles)),
+                                       data, _data_grid(data), spectra, with_curves, chunk_size)
+        depth[missing] = fallback[0]
+    if not with_curves:
+        return depth.reshape(shape), None
+
+    rows = corner_rows[inverse]
+    profiles = []
+    for start in range(0, max(len(rows), 1), chunk_size):
+        chunk_rows = rows[start:start + chunk_size]
+        coeffs = np.einsum("mk,mkn->mn", weights[start:start + chunk_size],
+                           spectra.rows(np.maximum(chunk_rows, 0)))
+        z = smoothing_array(fft_reconstruct.inverse_transform(coeffs), iterations=10)
+        z[np.any(chunk_rows < 0, axis=1)] = np.nan
+        profiles.append(np.stack([z.real, z.imag], axis=-1))
+    profiles = np.concatenate(profiles)
+    if fallback is not None:
+        profiles[missing] = fallback[1]
+    return depth.reshape(shape), profiles.reshape(shape + profiles.shape[1:])
+
+
+def _grid_profile_batch(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles, data, grid, spectra,
+                        with_curves, chunk_size):
+    shape = etch_ion_flux.shape
+    rows, weights = grid.locate(etch_ion_flux, etch_neu_flux, dep_ion_flux, dep_neu_flux, n_cycles)
+    found = rows >= 0
+    corner_depth = np.array([data[key]["depth"] for key in grid.keys])
+    depth = n_cycles.ravel() * np.sum(np.where(found, weights * corner_depth[np.maximum(rows, 0)], 0.0), axis=1)
+    depth[~np.any(found, axis=1)] = np.nan
+    if not with_curves:
+        return depth.reshape(shape), None
+
+    spectra_rows = np.array([spectra.index.get(key, -1) for key in grid.keys])[np.maximum(rows, 0)]
+    found &= spectra_rows >= 0
+    used = np.flatnonzero(np.any(found, axis=0))
+    profiles = []
+    for start in range(0, max(len(rows), 1), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        # Accumulate one corner column at a time to keep memory at (chunk, N)
+        coeffs = np.zeros((len(rows[chunk]), spectra.length), dtype=complex)
+        for c in used:
+            w = np.where(found[chunk, c], weights[chunk, c], 0.0)
+            coeffs += w[:, None] * spectra.rows(np.maximum(spectra_rows[chunk, c], 0))
+        z = smoothing_array(fft_reconstruct.inverse_transform(coeffs), iterations=10)
+        z[~np.any(found[chunk], axis=1)] = np.nan
+        profiles.append(np.stack([z.real, z.imag], axis=-1))
+    profiles = np.concatenate(profiles)
+    return depth.reshape(shape), profiles.reshape(shape + profiles.shape[1:])
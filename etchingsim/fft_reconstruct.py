@@ -1,36 +1,171 @@
+from functools import lru_cache
+
 import numpy as np
 
+import timing
+
 
+@timing.timed("fourier")
 def intermeidate_curve(x1, y1, x2, y2, weigth=0.5):
-    freqs1, coeffs1, z_full_1 = fourier_curve_reconstruction(x1, y1)
-    freqs2, coeffs2, z_full_2 = fourier_curve_reconstruction(x2, y2)
-    z_middle = reconstruct_curve(
-        weigth*coeffs1 + (1 - weigth)*coeffs2, weigth*freqs1 + (1 - weigth)*freqs2, num_points=400, top_k=None)
+    z = np.stack([np.asarray(x1) + 1j*np.asarray(y1), np.asarray(x2) + 1j*np.asarray(y2)])
+    coeffs = forward_transform(z)
+    z_middle = inverse_transform(weigth*coeffs[0] + (1 - weigth)*coeffs[1], num_points=400)
     return z_middle.real, z_middle.imag
 
 
+def default_frequencies(N):
+    return np.linspace(-50, 50, N)
+
+
+@lru_cache(maxsize=32)
+def forward_basis(N):
+    """
+    Returns the (N, N) matrix mapping N curve samples to the coefficients
+    at default_frequencies(N), so that coeffs = z @ forward_basis(N).
+    """
+    n = np.arange(N)
+    basis = np.exp(-2j * np.pi * np.outer(n, default_frequencies(N)) / N) / N
+    basis.setflags(write=False)
+    return basis
+
+
+@lru_cache(maxsize=32)
+def inverse_basis(N, num_points):
+    """
+    Returns the (N, num_points) matrix mapping the coefficients at
+    default_frequencies(N) to num_points curve samples, so that
+    z = coeffs @ inverse_basis(N, num_points).
+    """
+    t = np.linspace(0, 1, num_points, endpoint=False)
+    basis = np.exp(2j * np.pi * np.outer(default_frequencies(N), t))
+    basis.setflags(write=False)
+    return basis
+
+
+@lru_cache(maxsize=32)
+def cosine_basis(N):
+    """
+    Returns the orthonormal (N, N) DCT-II matrix, so that the cosine
+    coefficients of N curve samples are z @ cosine_basis(N) and
+    z = coeffs @ cosine_basis(N).T.
+
+    Unlike default_frequencies(N) this is an orthogonal basis, and the
+    energy of smooth open curves is held by their few lowest coefficients.
+    """
+    n = np.arange(N)
+    basis = np.sqrt(2 / N) * np.cos(np.pi * np.outer(n + 0.5, n) / N)
+    basis[:, 0] /= np.sqrt(2)
+    basis.setflags(write=False)
+    return basis
+
+
+@lru_cache(maxsize=32)
+def cosine_fourier_basis(N):
+    """
+    Returns the (N, N) matrix mapping cosine coefficients to the Fourier
+    coefficients of the same samples at default_frequencies(N).
+    """
+    basis = cosine_basis(N).T @ forward_basis(N)
+    basis.setflags(write=False)
+    return basis
+
+
+@lru_cache(maxsize=32)
+def cosine_inverse_basis(N, num_points):
+    """
+    Returns the (N, num_points) matrix mapping cosine coefficients to the
+    num_points curve samples inverse_transform gives for their Fourier
+    coefficients.
+    """
+    basis = cosine_fourier_basis(N) @ inverse_basis(N, num_points)
+    basis.setflags(write=False)
+    return basis
+
+
+def forward_transform(z):
+    """
+    Computes the Fourier coefficients of one or many curves at once.
+
+    z : complex array of shape (..., N), one curve per row
+    """
+    z = np.asarray(z)
+    return z @ forward_basis(z.shape[-1])
+
+
+def inverse_transform(coeffs, num_points=400):
+    """
+    Reconstructs one or many curves from coefficients at the default frequencies.
+
+    coeffs : complex array of shape (..., N), one curve per row
+    num_points : number of time samples to generate
+    """
+    coeffs = np.asarray(coeffs)
+    return coeffs @ inverse_basis(coeffs.shape[-1], num_points)
+
+
+def top_k_coefficients(coeffs, top_k):
+    """
+    Keeps the top_k largest coefficients of one or many curves.
+
+    coeffs : complex array of shape (..., N), one curve per row
+    top_k  : number of coefficients kept per curve
+
+    Returns (values, indices), both of shape (..., top_k): the kept
+    coefficients as complex64 and their positions along the last axis, in
+    increasing order, in the smallest unsigned type that holds them.
+    """
+    coeffs = np.asarray(coeffs)
+    N = coeffs.shape[-1]
+    top_k = min(top_k, N)
+    if top_k < N:
+        indices = np.argpartition(-np.abs(coeffs), top_k - 1, axis=-1)[..., :top_k]
+    else:
+        indices = np.broadcast_to(np.arange(N), coeffs.shape).copy()
+    indices.sort(axis=-1)
+    values = np.take_along_axis(coeffs, indices, axis=-1).astype(np.complex64)
+    return values, indices.astype(np.min_scalar_type(max(N - 1, 0)))
+
+
+def expand_coefficients(values, indices, N):
+    """
+    Returns the dense (..., N) coefficients of top_k_coefficients output,
+    zero at the dropped frequencies.
+    """
+    values = np.asarray(values)
+    coeffs = np.zeros(values.shape[:-1] + (N,), dtype=complex)
+    np.put_along_axis(coeffs, np.asarray(indices, dtype=np.intp), values, axis=-1)
+    return coeffs
+
+
+def sparse_cosine_inverse_transform(values, indices, N, num_points=400):
+    """
+    Reconstructs a curve from some of its N cosine coefficients, only
+    summing the given terms.
+
+    values  : complex array of shape (k,)
+    indices : positions of the values in cosine_basis(N)
+    """
+    return np.asarray(values) @ cosine_inverse_basis(N, num_points)[np.asarray(indices, dtype=np.intp)]
+
+
 def dft_at_frequencies(z, freqs):
     N = len(z)
+    freqs = np.asarray(freqs)
+    if len(freqs) == N and np.array_equal(freqs, default_frequencies(N)):
+        return z @ forward_basis(N)
     n = np.arange(N)
-    coeffs = []
-    for f in freqs:
-        coeffs.append(np.sum(z * np.exp(-2j * np.pi * f * n / N)) / N)
-    return np.array(coeffs)
+    return np.exp(-2j * np.pi * np.outer(freqs, n) / N) @ z / N
 
 
 def fourier_curve_reconstruction(x: np.array, y: np.array):
     if len(y) != len(x):
         raise ValueError("x and y must have the same length")
     # Convert to complex numbers
-    z = x + 1j*y
+    z = np.asarray(x) + 1j*np.asarray(y)
     N = len(z)
-    freqs = np.linspace(-50, 50, N)
-    coeffs = dft_at_frequencies(z, freqs)
-    # # Apply FFT
-    # coeffs = np.fft.fft(z) / N  # normalize
-    # freqs = np.fft.fftfreq(N, 1/N)
-    # Print first 10 coefficients for debugging
-    return freqs, coeffs, reconstruct_curve(coeffs, freqs)
+    freqs = default_frequencies(N)
+    coeffs = forward_transform(z)
+    return freqs, coeffs, inverse_transform(coeffs)
 
 
 def reconstruct_curve(coeffs, freqs, num_points=400, top_k=None):
@@ -42,16 +177,16 @@ def reconstruct_curve(coeffs, freqs, num_points=400, top_k=None):
     num_points : number of time samples to generate
     top_k  : use only top_k largest vectors (if None, use all)
     """
-    t = np.linspace(0, 1, num_points, endpoint=False)
-    z_rec = np.zeros(num_points, dtype=complex)
+    coeffs = np.asarray(coeffs)
+    freqs = np.asarray(freqs)
 
     if top_k is not None:
         # sort indices by amplitude
         indices = np.argsort(-np.abs(coeffs))[:top_k]
-    else:
-        indices = range(len(coeffs))
-
-    for i in indices:
-        z_rec += coeffs[i] * np.exp(2j*np.pi*freqs[i]*t)
+        coeffs = coeffs[indices]
+        freqs = freqs[indices]
+    elif len(freqs) == len(coeffs) and np.array_equal(freqs, default_frequencies(len(freqs))):
+        return inverse_transform(coeffs, num_points)
 
-    return z_rec
+    t = np.linspace(0, 1, num_points, endpoint=False)
+    return coeffs @ np.exp(2j * np.pi * np.outer(freqs, t))
@@ -0,0 +1,82 @@
+import os
+import threading
+from functools import partial
+
+import numpy as np
+
+from profile_db import FileCache
+
+DEFAULT_ROWS = (0, 4)
+
+
+def sidecar_path(csv_path, rows=DEFAULT_ROWS):
+    """
+    Returns the path of the NumPy sidecar holding the reduced rows of csv_path.
+    """
+    return f"{csv_path}.rows{rows[0]}-{rows[1]}.npy"
+
+
+def _reduce_csv(csv_path, rows):
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, nrows=rows[1])
+    target_rows = df.iloc[rows[0]:rows[1]].to_numpy(dtype=np.float64)
+    return np.average(target_rows, axis=0)
+
+
+def _load_reduced(csv_path, rows):
+    """
+    Loads the averaged CSV rows from the sidecar, rebuilding it when the CSV
+    has changed. The sidecar carries the CSV's mtime so staleness can be
+    detected without parsing anything.
+    """
+    path = sidecar_path(csv_path, rows)
+    csv_mtime = os.stat(csv_path).st_mtime_ns
+    try:
+        if os.stat(path).st_mtime_ns == csv_mtime:
+            return np.asarray(np.load(path, mmap_mode="r"))
+    except (FileNotFoundError, ValueError):
+        pass
+
+    reduced = _reduce_csv(csv_path, rows)
+    tmp_path = f"{path}.tmp{os.getpid()}.npy"
+    try:
+        np.save(tmp_path, reduced)
+        os.utime(tmp_path, ns=(csv_mtime, csv_mtime))
+        os.replace(tmp_path, path)
+    except OSError:
+        # Read-only data directory, serve the parsed series from memory
+        return reduced
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_for(builder, rows):
+    """
+    Returns the process-wide FileCache of builder(csv_path, rows=rows), so
+    each value derived from the flux CSV is built once per process and
+    rows, and rebuilt when the CSV changes.
+    """
+    key = (builder, tuple(rows))
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = FileCache(partial(builder, rows=tuple(rows)))
+        return _caches[key]
+
+
+def load_flux_series(csv_path, rows=DEFAULT_ROWS):
+    """
+    Returns the average of the selected CSV rows as a read-only array.
+
+    The first element is the depth column, the rest is the flux over time.
+    The reduced series is kept in memory per process and persisted next to
+    the CSV, so pandas only parses the file again after it changes.
+
+    Args:
+        csv_path (str): Path to the flux recording.
+        rows (tuple): (start, stop) range of the rows to average.
+    """
+    return cache_for(_load_reduced, rows).get(csv_path)
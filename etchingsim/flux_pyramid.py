@@ -0,0 +1,95 @@
+import numpy as np
+
+import timing
+from flux_data import DEFAULT_ROWS, cache_for, load_flux_series
+
+DISPLAY_POINTS = 500
+
+
+class FluxPyramid:
+    """
+    Min/max downsampling pyramid of a flux series.
+
+    Level k summarizes the series in buckets of 2**k samples by the minimum
+    and maximum of each bucket and where they occur. Any window can then be
+    drawn with at most a fixed number of points that keep every peak and
+    trough, reading one level instead of the samples.
+
+    Args:
+        flux (np.ndarray): The flux series.
+    """
+
+    def __init__(self, flux):
+        flux = np.asarray(flux, dtype=np.float64)
+        self.flux = flux
+        index = np.arange(len(flux))
+        # levels[k] = (min values, min positions, max values, max positions)
+        self.levels = [(flux, index, flux, index)]
+        while len(self.levels[-1][0]) > 1:
+            self.levels.append(self._reduce(*self.levels[-1]))
+
+    @staticmethod
+    def _reduce(min_values, min_index, max_values, max_index):
+        # Pair up the buckets, a trailing odd bucket is paired with itself
+        n = len(min_values)
+        left = np.arange(0, n, 2)
+        right = np.minimum(left + 1, n - 1)
+        take_right = min_values[right] < min_values[left]
+        mins = np.where(take_right, right, left)
+        take_right = max_values[right] > max_values[left]
+        maxs = np.where(take_right, right, left)
+        return min_values[mins], min_index[mins], max_values[maxs], max_index[maxs]
+
+    def __len__(self):
+        return len(self.flux)
+
+    def _edge(self, start, end):
+        window = self.flux[start:end]
+        return [start + int(np.argmin(window)), start + int(np.argmax(window))]
+
+    def window(self, start, end, num_points=DISPLAY_POINTS):
+        """
+        Returns the window [start, end) (slice semantics) downsampled to at
+        most num_points points.
+
+        Windows that fit are returned as they are. Longer windows are split
+        into buckets, each drawn by its minimum and maximum in time order.
+
+        Returns:
+            tuple: (positions, values), the sample positions within the
+            series and the flux at them.
+        """
+        start, end, _ = slice(start, end).indices(len(self.flux))
+        end = max(start, end)
+        if end - start <= num_points:
+            return np.arange(start, end), self.flux[start:end]
+
+        # Two points per bucket, pick the finest level that fits
+        level = max(int(np.ceil(np.log2(2 * (end - start) / max(num_points - 4, 2)))), 1)
+        level = min(level, len(self.levels) - 1)
+        size = 2**level
+        first, last = -(-start // size), end // size
+        if first >= last:
+            positions = np.unique(self._edge(start, end))
+            return positions, self.flux[positions]
+        min_values, min_index, max_values, max_index = self.levels[level]
+        positions = np.stack([min_index[first:last], max_index[first:last]], axis=1)
+        positions.sort(axis=1)
+        positions = positions.ravel()
+        # The partial buckets at both ends are read from the samples
+        head = self._edge(start, first * size) if start < first * size else []
+        tail = self._edge(last * size, end) if last * size < end else []
+        positions = np.unique(np.concatenate([head, positions, tail]).astype(np.int64))
+        return positions, self.flux[positions]
+
+
+def _build_pyramid(csv_path, rows):
+    return FluxPyramid(load_flux_series(csv_path, rows)[1:])
+
+
+@timing.timed("flux_pyramid")
+def load_flux_pyramid(csv_path, rows=DEFAULT_ROWS):
+    """
+    Returns the FluxPyramid of the flux series in csv_path, see cache_for.
+    """
+    return cache_for(_build_pyramid, rows).get(csv_path)
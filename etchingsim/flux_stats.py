@@ -0,0 +1,82 @@
+import numpy as np
+
+import timing
+from flux_data import DEFAULT_ROWS, cache_for, load_flux_series
+
+FLUX_THRESHOLD = 2500
+CYCLE_THRESHOLD = 4800
+
+
+def threshold_filter(sequence, filter=FLUX_THRESHOLD):
+    sequence = np.asarray(sequence)
+    return sequence[sequence > filter]
+
+
+def count_cycle(sequence, filter=CYCLE_THRESHOLD):
+    sequence = np.asarray(sequence)
+    return int(np.count_nonzero((sequence[1:] > filter) & (sequence[:-1] <= filter)))
+
+
+class FluxIndex:
+    """
+    Prefix-sum index over a flux series answering window statistics in O(1).
+
+    For any window [start, end) (Python slice semantics) it returns the same
+    values as np.mean(threshold_filter(flux[start:end])) and
+    count_cycle(flux[start:end]) without touching the samples.
+
+    Args:
+        flux (np.ndarray): The flux series.
+        threshold (float): Values above it are included in the average.
+        cycle_threshold (float): A cycle starts at each upward crossing of it.
+    """
+
+    def __init__(self, flux, threshold=FLUX_THRESHOLD, cycle_threshold=CYCLE_THRESHOLD):
+        flux = np.asarray(flux, dtype=np.float64)
+        self.size = len(flux)
+        above = flux > threshold
+        self._sum_above = np.concatenate([[0.0], np.cumsum(np.where(above, flux, 0.0))])
+        self._count_above = np.concatenate([[0], np.cumsum(above)])
+        crossings = (flux[1:] > cycle_threshold) & (flux[:-1] <= cycle_threshold)
+        self._crossings = np.concatenate([[0], np.cumsum(crossings)])
+
+    def _bounds(self, start, end):
+        start, end, _ = slice(start, end).indices(self.size)
+        return start, max(start, end)
+
+    def count_above(self, start, end):
+        start, end = self._bounds(start, end)
+        return int(self._count_above[end] - self._count_above[start])
+
+    def average_above(self, start, end):
+        """
+        Returns the mean of the values above the threshold in the window,
+        or nan when there are none.
+        """
+        start, end = self._bounds(start, end)
+        count = self._count_above[end] - self._count_above[start]
+        if count == 0:
+            return np.nan
+        return (self._sum_above[end] - self._sum_above[start]) / count
+
+    def count_cycles(self, start, end):
+        """
+        Returns the number of upward crossings of the cycle threshold in the window.
+        """
+        start, end = self._bounds(start, end)
+        if end - start < 2:
+            return 0
+        # Crossing i is between samples i and i + 1, both must be in the window
+        return int(self._crossings[end - 1] - self._crossings[start])
+
+
+def _build_index(csv_path, rows):
+    return FluxIndex(load_flux_series(csv_path, rows)[1:])
+
+
+@timing.timed("flux_index")
+def load_flux_index(csv_path, rows=DEFAULT_ROWS):
+    """
+    Returns the FluxIndex of the flux series in csv_path, see cache_for.
+    """
+    return cache_for(_build_index, rows).get(csv_path)
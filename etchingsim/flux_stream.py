@@ -0,0 +1,224 @@
+from collections import namedtuple
+
+import numpy as np
+
+from flux_data import DEFAULT_ROWS
+from flux_stats import CYCLE_THRESHOLD, FLUX_THRESHOLD
+
+CHUNK_SIZE = 65536
+READ_SIZE = 1 << 20
+
+CycleStats = namedtuple("CycleStats", ["index", "start", "end", "duration", "peak", "mean_above", "samples_above",
+                                       "complete"])
+CycleStats.__doc__ = """
+Statistics of one cycle, from the sample that crossed the cycle threshold up
+to (excluding) the sample of the next crossing. start and end are sample
+positions in the series, duration is in ms, mean_above is nan when no sample
+is above the flux threshold and complete is False for a cycle cut off by the
+end of the data.
+"""
+
+FluxSummary = namedtuple("FluxSummary", ["samples", "samples_above", "average_above", "n_cycles", "peak"])
+
+
+def _to_float(tokens):
+    try:
+        return np.asarray(tokens, dtype=np.float64)
+    except ValueError:
+        # Empty fields are missing values, as pandas reads them
+        return np.array([float(t) if t.strip() else np.nan for t in tokens])
+
+
+def _line_offsets(f, lines, read_size=READ_SIZE):
+    """
+    Returns the byte offsets of the given line numbers, scanning the file
+    in blocks so memory stays bounded by read_size.
+    """
+    wanted = sorted(lines)
+    offsets = {0: 0} if 0 in wanted else {}
+    line, position = 0, 0
+    f.seek(0)
+    while len(offsets) < len(wanted):
+        block = f.read(read_size)
+        if not block:
+            break
+        start = 0
+        while True:
+            newline = block.find(b"\n", start)
+            if newline < 0:
+                break
+            line += 1
+            if line in wanted:
+                offsets[line] = position + newline + 1
+            start = newline + 1
+        position += len(block)
+    return [offsets[line] for line in wanted if line in offsets]
+
+
+def _iter_row(path, offset, read_size=READ_SIZE):
+    """
+    Yields the values of the CSV line starting at offset, one array per
+    block read. A value split across two blocks is carried to the next one.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        carry = b""
+        while True:
+            block = f.read(read_size)
+            newline = block.find(b"\n")
+            done = not block or newline >= 0
+            if newline >= 0:
+                block = block[:newline]
+            block = carry + block
+            if done:
+                tokens = block.decode().rstrip("\r").split(",")
+                if tokens != [""]:
+                    yield _to_float(tokens)
+                return
+            block, _, carry = block.rpartition(b",")
+            if block:
+                yield _to_float(block.decode().split(","))
+
+
+def iter_flux_chunks(csv_path, rows=DEFAULT_ROWS, chunk_size=CHUNK_SIZE, read_size=READ_SIZE):
+    """
+    Streams the flux series of load_flux_series, the average of the selected
+    CSV rows without the leading depth column, in chunks of chunk_size.
+
+    Each row of the recording is a line of the CSV, so the selected lines
+    are read in lockstep, block by block, and memory stays bounded by the
+    chunk and block sizes however long the recording is.
+
+    Args:
+        csv_path (str): Path to the flux recording.
+        rows (tuple): (start, stop) range of the rows to average.
+        chunk_size (int): Number of samples per yielded chunk.
+        read_size (int): Number of bytes read from a line at a time.
+    """
+    with open(csv_path, "rb") as f:
+        # Line 0 is the header
+        offsets = _line_offsets(f, range(rows[0] + 1, rows[1] + 1), read_size)
+    readers, buffers = [], []
+    for offset in offsets:
+        reader = _iter_row(csv_path, offset, read_size)
+        values = next(reader, None)
+        # A trailing newline starts an empty line, which is not a row
+        if values is not None:
+            readers.append(reader)
+            buffers.append(values)
+    if not readers:
+        return
+    first = True
+    while True:
+        exhausted = True
+        for i, reader in enumerate(readers):
+            while len(buffers[i]) < chunk_size:
+                values = next(reader, None)
+                if values is None:
+                    break
+                buffers[i] = np.concatenate([buffers[i], values])
+            if len(buffers[i]) >= chunk_size:
+                exhausted = False
+        length = chunk_size if not exhausted else max(len(b) for b in buffers)
+        if length == 0:
+            return
+        # Rows shorter than the others have missing values there
+        block = np.full((len(buffers), length), np.nan)
+        for i, buffer in enumerate(buffers):
+            block[i, :min(length, len(buffer))] = buffer[:length]
+            buffers[i] = buffer[length:]
+        chunk = np.average(block, axis=0)
+        if first:
+            chunk, first = chunk[1:], False
+        if len(chunk):
+            yield chunk
+        if exhausted:
+            return
+
+
+def window_chunks(chunks, start=0, end=None):
+    """
+    Restricts a chunk stream to the samples [start, end) of the series.
+    """
+    position = 0
+    for chunk in chunks:
+        lo = max(start - position, 0)
+        hi = len(chunk) if end is None else min(end - position, len(chunk))
+        if hi > lo:
+            yield chunk[lo:hi]
+        position += len(chunk)
+        if end is not None and position >= end:
+            return
+
+
+def iter_cycles(chunks, threshold=FLUX_THRESHOLD, cycle_threshold=CYCLE_THRESHOLD, time_step=250):
+    """
+    Yields a CycleStats for each cycle of a chunk stream as soon as the next
+    cycle starts, and one for the last, incomplete cycle at the end.
+
+    A cycle starts at each upward crossing of cycle_threshold, as counted by
+    count_cycle, and the crossing state carries over chunk boundaries.
+    Samples before the first crossing don't belong to a cycle.
+    """
+    previous = None
+    position = 0
+    index = 0
+    cycle = None
+
+    def stats(cycle, end, complete):
+        start, peak, total, count = cycle
+        return CycleStats(index, int(start), int(end), (int(end) - int(start)) * time_step, float(peak),
+                          float(total / count) if count else np.nan, int(count), complete)
+
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        extended = chunk if previous is None else np.concatenate([[previous], chunk])
+        offset = 0 if previous is None else 1
+        crossings = np.flatnonzero((extended[1:] > cycle_threshold) & (extended[:-1] <= cycle_threshold)) + 1 - offset
+        # Segments of the chunk between crossings
+        bounds = np.concatenate([[0], crossings, [len(chunk)]])
+        for k in range(len(bounds) - 1):
+            lo, hi = bounds[k], bounds[k + 1]
+            if k > 0:
+                if cycle is not None:
+                    yield stats(cycle, position + lo, True)
+                    index += 1
+                cycle = [position + lo, -np.inf, 0.0, 0]
+            if cycle is None or hi == lo:
+                continue
+            segment = chunk[lo:hi]
+            above = segment[segment > threshold]
+            cycle[1] = max(cycle[1], segment.max())
+            cycle[2] += above.sum()
+            cycle[3] += len(above)
+        previous = chunk[-1]
+        position += len(chunk)
+
+    if cycle is not None:
+        yield stats(cycle, position, False)
+
+
+def summarize(chunks, threshold=FLUX_THRESHOLD, cycle_threshold=CYCLE_THRESHOLD):
+    """
+    Reduces a chunk stream to the statistics the dashboard shows for a
+    window: the same values as np.mean(threshold_filter(flux)) and
+    count_cycle(flux) on the whole series, plus its peak.
+    """
+    samples = samples_above = n_cycles = 0
+    total = 0.0
+    peak = -np.inf
+    previous = None
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        above = chunk[chunk > threshold]
+        samples += len(chunk)
+        samples_above += len(above)
+        total += above.sum()
+        peak = max(peak, chunk.max())
+        extended = chunk if previous is None else np.concatenate([[previous], chunk])
+        n_cycles += int(np.count_nonzero((extended[1:] > cycle_threshold) & (extended[:-1] <= cycle_threshold)))
+        previous = chunk[-1]
+    average_above = float(total / samples_above) if samples_above else np.nan
+    return FluxSummary(samples, samples_above, average_above, n_cycles, float(peak) if samples else np.nan)
@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+
+import timing
+from profile_grid import ProfileGrid
+from profile_store import STORE_SUFFIX, ProfileStore
+from spectral_library import SpectralLibrary
+
+
+class FileCache:
+    """
+    Process-wide cache of parsed data files.
+
+    Each file is parsed once and kept resident. A cached entry is reused as
+    long as the file's (mtime, size) signature is unchanged, and reloaded
+    otherwise. The cached objects are shared between callers and must be
+    treated as read-only.
+
+    Args:
+        loader (callable): Function taking a path and returning the parsed data.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+
+        # Parse outside the lock so a slow load does not block other files
+        data = self.loader(path)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._entries[path] = (signature, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.reloads = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "entries": len(self._entries),
+            }
+
+
+def _load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+_json_cache = FileCache(_load_json)
+_store_cache = FileCache(ProfileStore)
+
+
+def load_json(path):
+    """
+    Returns the parsed contents of a JSON file, cached per process.
+    """
+    return _json_cache.get(path)
+
+
+def write_json_atomic(path, data):
+    """
+    Writes data as JSON to a temporary file next to path and moves it into
+    place, so readers never see a partially written file.
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def resolve_profile_db(path):
+    """
+    Returns the file that should be read for the profile database at path.
+
+    A binary store next to a JSON database (same name, .etchdb suffix) is
+    preferred as long as it is not older than the JSON file.
+    """
+    if path.endswith(STORE_SUFFIX):
+        return path
+    binary_path = os.path.splitext(path)[0] + STORE_SUFFIX
+    try:
+        binary_stat = os.stat(binary_path)
+    except FileNotFoundError:
+        return path
+    try:
+        json_stat = os.stat(path)
+    except FileNotFoundError:
+        return binary_path
+    return binary_path if binary_stat.st_mtime_ns >= json_stat.st_mtime_ns else path
+
+
+@timing.timed("profile_db")
+def load_profile_db(path):
+    """
+    Returns the profile database stored at path, parsed once per process
+    and reloaded only when the file changes on disk.
+
+    Args:
+        path (str): Path to the profile database, either JSON or a binary store.
+
+    Returns:
+        Mapping of curve keys to {"points": [...], "depth": float}.
+    """
+    path = resolve_profile_db(path)
+    if path.endswith(STORE_SUFFIX):
+        return _store_cache.get(path)
+    return _json_cache.get(path)
+
+
+def file_version(path):
+    """
+    Returns a string identifying the current contents of the file at path,
+    derived from its (mtime, size).
+    """
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def profile_db_version(path):
+    """
+    Returns a string identifying the current contents of the profile database
+    at path, derived from the file that would be loaded and its (mtime, size).
+    """
+    path = resolve_profile_db(path)
+    return f"{os.path.basename(path)}:{file_version(path)}"
+
+
+def _build_spectra(path):
+    data = load_profile_db(path)
+    if isinstance(data, ProfileStore) and data.spectra is not None:
+        return data.spectra
+    return SpectralLibrary.from_profiles(data)
+
+
+_spectra_cache = FileCache(_build_spectra)
+
+
+@timing.timed("spectra")
+def load_spectra(path):
+    """
+    Returns the precomputed Fourier coefficients of the profile database at
+    path. They are read from a binary store when it carries them and computed
+    once per process otherwise.
+    """
+    return _spectra_cache.get(resolve_profile_db(path))
+
+
+def _build_grid(path):
+    return ProfileGrid.from_profiles(load_profile_db(path))
+
+
+_grid_cache = FileCache(_build_grid)
+
+
+@timing.timed("profile_grid")
+def load_profile_grid(path):
+    """
+    Returns the ProfileGrid indexing the profile database at path, built
+    once per process and rebuilt when the file changes.
+    """
+    return _grid_cache.get(resolve_profile_db(path))
+
+
+def cache_stats():
+    """
+    Returns the hit/miss/reload counters of the profile database caches.
+    """
+    return {"json": _json_cache.stats(), "store": _store_cache.stats(),
+            "spectra": _spectra_cache.stats(), "grid": _grid_cache.stats()}
+
+
+def clear_cache():
+    _json_cache.clear()
+    _store_cache.clear()
+    _spectra_cache.clear()
+    _grid_cache.clear()
@@ -0,0 +1,132 @@
+import itertools
+
+import numpy as np
+
+AXES = ("etch_ion_flux", "etch_neu_flux", "dep_ion_flux", "dep_neu_flux", "n_cycles")
+
+
+def parse_key(key):
+    """
+    Parses a profile key such as "4_0.5_3_2_70" into its five parameters.
+
+    Returns:
+        tuple: The parameters as floats, or None when key is not a profile key.
+    """
+    parts = key.split("_")
+    if len(parts) != len(AXES):
+        return None
+    try:
+        return tuple(float(part) for part in parts)
+    except ValueError:
+        return None
+
+
+class ProfileGrid:
+    """
+    Numeric index of the curves of a profile database.
+
+    Keys are parsed into (etch ion, etch neutral, dep ion, dep neutral,
+    n_cycles) points, so "3.0_0.5_0_0_4" and "3_0.5_0_0_4" name the same
+    curve. The sorted distinct values of each parameter form the axes of a
+    grid and every grid cell maps to the row of its curve, or -1 where the
+    database has no curve.
+
+    Lookups locate an operating point on each axis with a binary search and
+    return the bracketing corners with their multilinear weights. Values
+    outside an axis are clamped to its ends.
+
+    Args:
+        keys (list): Profile keys. Keys that don't parse are ignored.
+    """
+
+    def __init__(self, keys):
+        parsed = [(key, parse_key(key)) for key in keys]
+        parsed = [(key, params) for key, params in parsed if params is not None]
+        self.keys = [key for key, _ in parsed]
+        params = np.array([params for _, params in parsed], dtype=np.float64).reshape(-1, len(AXES))
+        self.axes = [np.unique(params[:, d]) for d in range(len(AXES))]
+        indices = tuple(np.searchsorted(axis, params[:, d]) for d, axis in enumerate(self.axes))
+        self.rows = np.full([len(axis) for axis in self.axes], -1, dtype=np.int64)
+        self.rows[indices] = np.arange(len(self.keys))
+
+    @classmethod
+    def from_profiles(cls, data):
+        return cls([key for key in data if len(data[key]["points"])])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def key(self, *params):
+        """
+        Returns the key of the curve at exactly the given parameters, or None.
+        """
+        index = []
+        for axis, value in zip(self.axes, params):
+            i = np.searchsorted(axis, value)
+            if i == len(axis) or axis[i] != value:
+                return None
+            index.append(i)
+        row = self.rows[tuple(index)]
+        return self.keys[row] if row >= 0 else None
+
+    def _bracket(self, values):
+        # Index of the lower grid value and the weight of the upper one, per axis
+        lower = np.empty(values.shape, dtype=np.int64)
+        upper = np.empty(values.shape, dtype=np.int64)
+        t = np.zeros(values.shape)
+        for d, axis in enumerate(self.axes):
+            i = np.clip(np.searchsorted(axis, values[:, d], side="right") - 1, 0, len(axis) - 1)
+            j = np.minimum(i + 1, len(axis) - 1)
+            span = axis[j] - axis[i]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                t[:, d] = np.where(span > 0, np.clip((values[:, d] - axis[i]) / span, 0, 1), 0)
+            lower[:, d], upper[:, d] = i, j
+        return lower, upper, t
+
+    def locate(self, *params):
+        """
+        Finds the bracketing curves of many operating points at once.
+
+        The arguments are broadcast against each other. Corners without a
+        curve in the database are dropped and the weights of the remaining
+        corners renormalized.
+
+        Returns:
+            tuple: (rows, weights), both of shape (m, 2**5) for m operating
+            points. rows index self.keys, -1 marks an unused corner. A point
+            without any available corner has all weights nan.
+        """
+        values = np.stack([np.ravel(a) for a in np.broadcast_arrays(
+            *[np.asarray(p, dtype=np.float64) for p in params])], axis=1)
+        if not self.keys:
+            shape = (len(values), 2**len(AXES))
+            return np.full(shape, -1, dtype=np.int64), np.full(shape, np.nan)
+        lower, upper, t = self._bracket(values)
+        rows, weights = [], []
+        for corner in itertools.product((0, 1), repeat=len(AXES)):
+            corner = np.array(corner)
+            index = np.where(corner, upper, lower)
+            rows.append(self.rows[tuple(index.T)])
+            weights.append(np.prod(np.where(corner, t, 1 - t), axis=1))
+        rows = np.stack(rows, axis=1)
+        weights = np.where(rows >= 0, np.stack(weights, axis=1), 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weights = weights / weights.sum(axis=1, keepdims=True)
+        rows[weights == 0] = -1
+        return rows, weights
+
+    def corners(self, *params):
+        """
+        Returns the bracketing curves of one operating point.
+
+        Returns:
+            list: (key, weight) pairs with positive weights summing to 1.
+
+        Raises:
+            KeyError: When no bracketing curve exists in the database.
+        """
+        rows, weights = self.locate(*params)
+        found = rows[0] >= 0
+        if not np.any(found):
+            raise KeyError(f"No profile around {dict(zip(AXES, params))}")
+        return [(self.keys[row], float(weight)) for row, weight in zip(rows[0][found], weights[0][found])]
@@ -0,0 +1,219 @@
+import json
+import os
+import struct
+from collections.abc import Mapping
+
+import numpy as np
+
+from curve_resample import RESAMPLE_POINTS, resample_arc_length
+from spectral_library import CompressedSpectralLibrary, SpectralLibrary, compression_report
+
+STORE_SUFFIX = ".etchdb"
+MAGIC = b"ETCHDB1\0"
+ALIGNMENT = 64
+# Largest relative reconstruction error a compressed store may have, see
+# compression_report; stores are served like any other once written
+MAX_COMPRESSION_ERROR = 1e-3
+# Basis of the coefficients of compressed stores, stores written with
+# another one have to be converted again
+COMPRESSED_BASIS = "cosine"
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_store(out_path, keys, sections, meta=None):
+    """
+    Writes named arrays to a binary profile store.
+
+    The file layout is the magic bytes, a little-endian uint64 header length,
+    a JSON header describing each section, then the raw section bytes, each
+    aligned to 64 bytes so they can be memory-mapped in place. The file is
+    written to a temporary path and moved into place atomically.
+
+    Args:
+        out_path (str): Path of the output store.
+        keys (list): Curve keys, in row order.
+        sections (dict): Mapping of section name to a NumPy array.
+        meta (dict): Extra JSON-serializable metadata stored in the header.
+    """
+    header = {"keys": list(keys), "meta": meta or {}, "sections": {}}
+    arrays = {name: np.ascontiguousarray(array) for name, array in sections.items()}
+
+    # The header size depends on the section offsets, which depend on the
+    # header size, so lay the sections out after a generously padded header.
+    layout = {name: {"dtype": array.dtype.str, "shape": list(array.shape), "offset": 0}
+              for name, array in arrays.items()}
+    header["sections"] = layout
+    header_size = _align(len(MAGIC) + 8 + len(json.dumps(header)) + 32 * len(arrays) + 64)
+    offset = header_size
+    for name, array in arrays.items():
+        layout[name]["offset"] = offset
+        offset = _align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode()
+    if len(MAGIC) + 8 + len(header_bytes) > header_size:
+        raise ValueError("Profile store header does not fit in its reserved space.")
+
+    tmp_path = f"{out_path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(max(offset, header_size))
+    os.replace(tmp_path, out_path)
+
+
+def pack_profiles(data, dtype="float64", with_spectra=True, num_points=None, top_k=None,
+                  max_error=MAX_COMPRESSION_ERROR):
+    """
+    Packs a profile database into flat arrays.
+
+    Args:
+        data (dict): Mapping of curve keys to {"points": [[x, y, z], ...], "depth": float}.
+        dtype (str): Floating point type of the stored coordinates.
+        with_spectra (bool): Also store the precomputed Fourier coefficients.
+        num_points (int): Resample every curve to this many points evenly
+            spaced along arc length, or None to store the points as they are.
+        top_k (int): Only store the top_k largest coefficients of each curve,
+            see CompressedSpectralLibrary, or None to store all of them.
+        max_error (float): Largest relative reconstruction error allowed with top_k.
+
+    Returns:
+        tuple: (keys, sections) as accepted by write_store.
+
+    Raises:
+        ValueError: When top_k coefficients reconstruct the curves with a
+            larger error than max_error.
+    """
+    if with_spectra:
+        spectra = SpectralLibrary.from_profiles(data, num_points or RESAMPLE_POINTS)
+    if num_points is not None:
+        data = {key: {**entry, "points": resample_arc_length(entry["points"], num_points)}
+                for key, entry in data.items()}
+    keys = list(data)
+    lengths = np.array([len(data[key]["points"]) for key in keys], dtype=np.int64)
+    offsets = np.zeros(len(keys), dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)[:-1]
+    points = np.empty((int(lengths.sum()), 2), dtype=dtype)
+    for key, offset, length in zip(keys, offsets, lengths):
+        if length:
+            # Drop the z column, it is always zero for 2-D profiles
+            points[offset:offset + length] = np.asarray(data[key]["points"], dtype=dtype)[:, :2]
+    depth = np.array([data[key].get("depth", 0.0) for key in keys], dtype=np.float64)
+    sections = {"points": points, "offsets": offsets, "lengths": lengths, "depth": depth}
+    if with_spectra:
+        sections["spectra_rows"] = np.array([spectra.index.get(key, -1) for key in keys], dtype=np.int64)
+        if top_k is None:
+            sections["coeffs"] = spectra.coeffs
+        else:
+            error = compression_report(spectra, [top_k])[0]["relative_error"]
+            if error > max_error:
+                raise ValueError(f"{top_k} coefficients per curve give a relative error of {error:.3g}, "
+                                 f"above the allowed {max_error:.3g}.")
+            compressed = spectra.compress(top_k)
+            sections["coeff_values"] = compressed.values
+            sections["coeff_indices"] = compressed.indices
+    return keys, sections
+
+
+def convert_json_db(json_path, out_path=None, dtype="float64", with_spectra=True, num_points=RESAMPLE_POINTS,
+                    top_k=None, max_error=MAX_COMPRESSION_ERROR):
+    """
+    Converts a JSON profile database into the binary profile store format.
+
+    Args:
+        json_path (str): Path to the JSON profile database.
+        out_path (str): Output path, defaults to json_path with the .etchdb suffix.
+        dtype (str): "float32" or "float64" storage for the point coordinates.
+        with_spectra (bool): Also store the precomputed Fourier coefficients.
+        num_points (int): Number of points every curve is resampled to, or
+            None to keep the curves as they are in the JSON database.
+        top_k (int): Number of Fourier coefficients stored per curve, or
+            None to store all of them.
+        max_error (float): Largest relative reconstruction error allowed
+            with top_k, see pack_profiles.
+
+    Returns:
+        str: The path of the written store.
+    """
+    if out_path is None:
+        out_path = os.path.splitext(json_path)[0] + STORE_SUFFIX
+    with open(json_path) as f:
+        data = json.load(f)
+    keys, sections = pack_profiles(data, dtype, with_spectra, num_points, top_k, max_error)
+    write_store(out_path, keys, sections,
+                meta={"source": os.path.basename(json_path), "num_points": num_points, "top_k": top_k,
+                      "coeff_basis": COMPRESSED_BASIS if top_k is not None else None})
+    return out_path
+
+
+class ProfileStore(Mapping):
+    """
+    Read-only, memory-mapped view of a binary profile store.
+
+    Behaves like the JSON profile database: store[key] returns
+    {"points": ndarray of shape (n, 2), "depth": float}, where the points
+    are zero-copy views into the mapped file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a profile store.")
+            (header_length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length))
+
+        self._buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        self.meta = header["meta"]
+        self.sections = {}
+        for name, section in header["sections"].items():
+            dtype = np.dtype(section["dtype"])
+            shape = tuple(section["shape"])
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            start = section["offset"]
+            self.sections[name] = self._buffer[start:start + nbytes].view(dtype).reshape(shape)
+
+        self.keys_list = header["keys"]
+        self.index = {key: i for i, key in enumerate(self.keys_list)}
+        self.points = self.sections["points"]
+        self.offsets = self.sections["offsets"]
+        self.lengths = self.sections["lengths"]
+        self.depth = self.sections["depth"]
+        self.spectra = None
+        if "spectra_rows" in self.sections:
+            rows = self.sections["spectra_rows"]
+            spectra_keys = [self.keys_list[i] for i in np.argsort(rows) if rows[i] >= 0]
+            if "coeffs" in self.sections:
+                self.spectra = SpectralLibrary(spectra_keys, self.sections["coeffs"])
+            else:
+                if self.meta.get("coeff_basis") != COMPRESSED_BASIS:
+                    raise ValueError(f"{path} stores compressed coefficients in an older basis, convert it again.")
+                self.spectra = CompressedSpectralLibrary(spectra_keys, self.sections["coeff_values"],
+                                                         self.sections["coeff_indices"],
+                                                         self.meta.get("num_points") or RESAMPLE_POINTS)
+
+    def curve(self, key):
+        i = self.index[key]
+        offset = self.offsets[i]
+        return self.points[offset:offset + self.lengths[i]]
+
+    def __getitem__(self, key):
+        i = self.index[key]
+        offset = self.offsets[i]
+        return {"points": self.points[offset:offset + self.lengths[i]],
+                "depth": float(self.depth[i])}
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.keys_list)
+
+    def __len__(self):
+        return len(self.keys_list)
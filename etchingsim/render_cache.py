@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+RENDER_SUFFIX = ".svg"
+META_SUFFIX = ".json"
+
+
+def _round(value, precision):
+    if isinstance(value, float):
+        return round(value, precision)
+    if isinstance(value, (list, tuple)):
+        return [_round(v, precision) for v in value]
+    if hasattr(value, "item"):
+        return _round(value.item(), precision)
+    return value
+
+
+class RenderCache:
+    """
+    Content-addressed, size-bounded cache of rendered profile images.
+
+    Entries are named after the SHA-256 of their rounded render inputs, so
+    identical parameter sets share one file and different ones never collide.
+    Files are written to a temporary name and moved into place atomically.
+    When the cache grows past max_bytes the least recently used entries are
+    removed down to low_water of it; a hit refreshes the entry's mtime.
+
+    The directory is only scanned when the bytes written since the last scan
+    may have exceeded the budget, or every rescan_every renders to account
+    for other processes sharing it, so filling the cache stays linear.
+
+    Args:
+        root (str): Directory holding the cached renders.
+        max_bytes (int): Size bound of the cache directory.
+        precision (int): Number of decimals the float inputs are rounded to.
+        low_water (float): Fraction of max_bytes an eviction shrinks the cache to.
+        rescan_every (int): Number of renders between scans under the budget.
+    """
+
+    def __init__(self, root, max_bytes=64 * 1024 * 1024, precision=4, low_water=0.9, rescan_every=256):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.precision = precision
+        self.low_water = low_water
+        self.rescan_every = rescan_every
+        self._lock = threading.Lock()
+        # Size of the cache as of the last scan plus what was written since
+        self._total = None
+        self._renders_since_scan = 0
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, params):
+        """
+        Returns the cache key of a dict of render inputs.
+        """
+        rounded = {name: _round(value, self.precision) for name, value in params.items()}
+        encoded = json.dumps(rounded, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def filename(self, key):
+        return key + RENDER_SUFFIX
+
+    def path(self, key):
+        return os.path.join(self.root, self.filename(key))
+
+    def get(self, key):
+        """
+        Returns the metadata stored with a cached render, or None on a miss.
+        """
+        meta_path = os.path.join(self.root, key + META_SUFFIX)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            os.utime(self.path(key))
+            os.utime(meta_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return meta
+
+    def _write_atomic(self, final_path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def render(self, key, render):
+        """
+        Renders an entry and stores it under key.
+
+        Args:
+            key (str): Cache key from RenderCache.key.
+            render (callable): Called with a path to write the image to, returns
+                the JSON-serializable metadata stored with the image.
+
+        Returns:
+            dict: The metadata returned by render.
+        """
+        meta = {}
+        self._write_atomic(self.path(key), lambda tmp_path: meta.update(render(tmp_path) or {}))
+
+        def write_meta(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+
+        # The metadata is written last, so a present entry always has its image
+        meta_path = os.path.join(self.root, key + META_SUFFIX)
+        self._write_atomic(meta_path, write_meta)
+        try:
+            written = os.path.getsize(self.path(key)) + os.path.getsize(meta_path)
+        except FileNotFoundError:
+            written = 0
+        with self._lock:
+            self._renders_since_scan += 1
+            if self._total is not None:
+                self._total += written
+            scan = (self._total is None or self._total > self.max_bytes
+                    or self._renders_since_scan >= self.rescan_every)
+        if scan:
+            self.evict()
+        return meta
+
+    def get_or_render(self, key, render):
+        meta = self.get(key)
+        if meta is None:
+            meta = self.render(key, render)
+        return meta
+
+    def evict(self):
+        """
+        Scans the cache and, when it exceeds max_bytes, removes the least
+        recently used entries until it fits in low_water of it.
+        """
+        with self._lock:
+            entries = {}
+            total = 0
+            for entry in os.scandir(self.root):
+                name, suffix = os.path.splitext(entry.name)
+                if suffix not in (RENDER_SUFFIX, META_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another process since the scan listed it
+                    continue
+                total += stat.st_size
+                size, mtime = entries.get(name, (0, 0))
+                entries[name] = (size + stat.st_size, max(mtime, stat.st_mtime_ns))
+
+            target = self.max_bytes * self.low_water if total > self.max_bytes else self.max_bytes
+            for name, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= target:
+                    break
+                for suffix in (META_SUFFIX, RENDER_SUFFIX):
+                    try:
+                        os.remove(os.path.join(self.root, name + suffix))
+                    except FileNotFoundError:
+                        pass
+                total -= size
+            self._total = total
+            self._renders_since_scan = 0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_render_cache(root, max_bytes=64 * 1024 * 1024):
+    """
+    Returns the process-wide RenderCache for root.
+    """
+    with _caches_lock:
+        if root not in _caches:
+            _caches[root] = RenderCache(root, max_bytes)
+        return _caches[root]
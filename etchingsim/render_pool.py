@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import namedtuple
+
+from profile_db import load_profile_db, load_profile_grid, load_spectra
+
+RenderJob = namedtuple("RenderJob", ["etch_ion_flux", "etch_neu_flux", "dep_ion_flux", "dep_neu_flux",
+                                     "n_cycles", "db_path", "etching_limits"])
+
+
+class QueueFull(Exception):
+    """
+    Raised when a render job is submitted while the pool's queue is full.
+    """
+
+
+def _init_worker(db_paths):
+    # Load the profile databases once per worker so jobs only pay for the blend
+    for db_path in db_paths:
+        try:
+            load_profile_db(db_path)
+            load_spectra(db_path)
+            load_profile_grid(db_path)
+        except FileNotFoundError:
+            pass
+
+
+def _render_job(job):
+    from etchingsim import etching_profile
+    from vtp_to_svg import points_to_svg
+
+    data = load_profile_db(job.db_path)
+    spectra = load_spectra(job.db_path)
+    grid = load_profile_grid(job.db_path)
+    depth, points = etching_profile(job.etch_ion_flux, job.etch_neu_flux, job.dep_ion_flux, job.dep_neu_flux,
+                                    job.n_cycles, data, list(job.etching_limits), spectra, grid=grid)
+    return depth, points_to_svg(points)
+
+
+class RenderPool:
+    """
+    Pool of worker processes rendering etching profiles.
+
+    Each worker keeps the profile databases loaded. At most
+    processes + max_queue jobs are pending at once; submitting more raises
+    QueueFull. A job identical to one still in flight shares its future
+    instead of being rendered twice.
+
+    Args:
+        processes (int): Number of worker processes.
+        max_queue (int): Number of jobs allowed to wait for a worker.
+        db_paths (list): Profile databases preloaded by every worker.
+    """
+
+    def __init__(self, processes=2, max_queue=32, db_paths=()):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.processes = processes
+        self.max_queue = max_queue
+        self._executor = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                             initargs=(tuple(db_paths),))
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _finish(self, job, started):
+        def done(future):
+            latency = time.perf_counter() - started
+            with self._lock:
+                self._in_flight.pop(job, None)
+                self.completed += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+        return done
+
+    def submit(self, job):
+        """
+        Submits a RenderJob and returns a future of (depth, svg bytes).
+        """
+        job = job._replace(etching_limits=tuple(job.etching_limits))
+        with self._lock:
+            future = self._in_flight.get(job)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            if len(self._in_flight) >= self.processes + self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"{len(self._in_flight)} render jobs already pending")
+            started = time.perf_counter()
+            future = self._executor.submit(_render_job, job)
+            self._in_flight[job] = future
+            self.submitted += 1
+        future.add_done_callback(self._finish(job, started))
+        return future
+
+    def render(self, job, timeout=None):
+        return self.submit(job).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": len(self._in_flight),
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "mean_latency": self.total_latency / self.completed if self.completed else 0.0,
+                "max_latency": self.max_latency,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool(processes=2, max_queue=32, db_paths=()):
+    """
+    Returns the process-wide RenderPool, created on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool(processes, max_queue, db_paths)
+        return _pool
@@ -0,0 +1,189 @@
+import numpy as np
+
+import fft_reconstruct
+import timing
+from curve_resample import RESAMPLE_POINTS, resample_arc_length
+
+
+class SpectralLibrary:
+    """
+    Fourier coefficients of every curve of a profile database.
+
+    All curves are resampled to N points evenly spaced along their arc
+    length, so that their coefficients share the frequencies
+    default_frequencies(N). A blend of curves is then
+    a weighted sum of coefficient rows followed by a single inverse transform.
+
+    Args:
+        keys (list): Curve keys, in row order.
+        coeffs (np.ndarray): Complex array of shape (len(keys), N).
+        samples (np.ndarray): The resampled curves as complex samples of
+            the same shape, needed by compress(); None when only the
+            coefficients were stored.
+    """
+
+    def __init__(self, keys, coeffs, samples=None):
+        self.keys = list(keys)
+        self.coeffs = coeffs
+        self.samples = samples
+        self.index = {key: i for i, key in enumerate(self.keys)}
+
+    @classmethod
+    def from_profiles(cls, data, length=RESAMPLE_POINTS):
+        """
+        Precomputes the coefficients of every curve in a profile database.
+
+        Args:
+            data (Mapping): Mapping of curve keys to {"points": [...], "depth": float}.
+            length (int): Number of points every curve is resampled to.
+        """
+        keys = [key for key in data if len(data[key]["points"])]
+        if not keys:
+            return cls(keys, np.zeros((0, length), dtype=complex), np.zeros((0, length), dtype=complex))
+        aligned = np.stack([resample_arc_length(data[key]["points"], length) for key in keys])
+        samples = aligned[..., 0] + 1j*aligned[..., 1]
+        return cls(keys, fft_reconstruct.forward_transform(samples), samples)
+
+    @property
+    def frequencies(self):
+        return fft_reconstruct.default_frequencies(self.length)
+
+    @property
+    def length(self):
+        return self.coeffs.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.coeffs.nbytes
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def rows(self, rows):
+        """
+        Returns the coefficients of the curves at the given row positions.
+        """
+        return self.coeffs[rows]
+
+    def compress(self, top_k):
+        """
+        Returns a CompressedSpectralLibrary keeping top_k cosine coefficients
+        per curve.
+        """
+        if self.samples is None:
+            raise ValueError("Compressing a spectral library needs its resampled curves, see from_profiles.")
+        cosine = self.samples @ fft_reconstruct.cosine_basis(self.length)
+        values, indices = fft_reconstruct.top_k_coefficients(cosine, top_k)
+        return CompressedSpectralLibrary(self.keys, values, indices, self.length)
+
+    def blend(self, keys, weights):
+        """
+        Returns the weighted sum of the coefficients of the given curves.
+        """
+        rows = [self.index[key] for key in keys]
+        return np.asarray(weights, dtype=np.float64) @ self.coeffs[rows]
+
+    @timing.timed("fourier")
+    def blend_curve(self, keys, weights, num_points=400):
+        """
+        Returns the blended curve as num_points complex samples.
+        """
+        return fft_reconstruct.inverse_transform(self.blend(keys, weights), num_points)
+
+
+class CompressedSpectralLibrary:
+    """
+    SpectralLibrary keeping only the top_k largest coefficients of each
+    curve, as complex64 values and their indices.
+
+    The coefficients are those of the resampled curves in the orthonormal
+    cosine basis rather than at default_frequencies(N), which is not a
+    basis: only an orthogonal one concentrates a curve in its largest
+    coefficients. Each curve then takes top_k * 9 bytes instead of N * 16,
+    and a blend only sums the coefficients its curves keep in the inverse
+    transform. rows() converts them back to the N Fourier coefficients for
+    the batch code.
+
+    Args:
+        keys (list): Curve keys, in row order.
+        values (np.ndarray): complex64 array of shape (len(keys), top_k).
+        indices (np.ndarray): Positions of the values in
+            cosine_basis(length), same shape as values.
+        length (int): Number of coefficients of the uncompressed library.
+    """
+
+    def __init__(self, keys, values, indices, length):
+        self.keys = list(keys)
+        self.values = values
+        self.indices = indices
+        self.length = int(length)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+
+    @property
+    def top_k(self):
+        return self.values.shape[1]
+
+    @property
+    def frequencies(self):
+        return fft_reconstruct.default_frequencies(self.length)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.indices.nbytes
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def _fourier(self, values, indices):
+        cosine = fft_reconstruct.expand_coefficients(values, indices, self.length)
+        return cosine @ fft_reconstruct.cosine_fourier_basis(self.length)
+
+    def rows(self, rows):
+        return self._fourier(self.values[rows], self.indices[rows])
+
+    def _sparse_blend(self, keys, weights):
+        rows = [self.index[key] for key in keys]
+        indices = self.indices[rows].ravel()
+        terms = (np.asarray(weights, dtype=np.float64)[:, None] * self.values[rows]).ravel()
+        used, position = np.unique(indices, return_inverse=True)
+        blended = np.zeros(len(used), dtype=complex)
+        np.add.at(blended, position, terms)
+        return blended, used
+
+    def blend(self, keys, weights):
+        return self._fourier(*self._sparse_blend(keys, weights))
+
+    @timing.timed("fourier")
+    def blend_curve(self, keys, weights, num_points=400):
+        blended, used = self._sparse_blend(keys, weights)
+        return fft_reconstruct.sparse_cosine_inverse_transform(blended, used, self.length, num_points)
+
+
+def compression_report(spectra, top_ks, num_points=400):
+    """
+    Measures how top-k compression of a SpectralLibrary trades accuracy for size.
+
+    Every curve is reconstructed from all of its coefficients and from the
+    top_k largest cosine coefficients, and compared point by point.
+
+    Returns:
+        list: One dict per top_k with the library size in bytes, its ratio to
+        the uncompressed size, and the RMS and maximum point distance over all
+        curves, also relative to the largest curve extent.
+    """
+    full = fft_reconstruct.inverse_transform(spectra.coeffs, num_points)
+    extent = max(float(np.ptp(full.real, axis=-1).max(initial=0)), float(np.ptp(full.imag, axis=-1).max(initial=0)))
+    report = []
+    for top_k in top_ks:
+        compressed = spectra.compress(top_k)
+        error = np.abs(fft_reconstruct.inverse_transform(compressed.rows(slice(None)), num_points) - full)
+        max_error = float(error.max(initial=0))
+        report.append({
+            "top_k": compressed.top_k,
+            "bytes": compressed.nbytes,
+            "ratio": compressed.nbytes / spectra.nbytes if spectra.nbytes else 0.0,
+            "rms_error": float(np.sqrt(np.mean(error**2))) if error.size else 0.0,
+            "max_error": max_error,
+            "relative_error": max_error / extent if extent else 0.0,
+        })
+    return report
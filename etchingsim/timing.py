@@ -0,0 +1,161 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+_enabled = False
+_current = contextvars.ContextVar("timings", default=None)
+_histograms = {}
+_histograms_lock = threading.Lock()
+_noop = nullcontext()
+
+
+def enable(enabled=True):
+    """
+    Turns stage timing on or off for the whole process. While off, stage()
+    and timed() cost a flag check.
+    """
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+class Histogram:
+    """
+    Duration histogram with fixed buckets, see BUCKETS_MS.
+    """
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "max_ms": self.max,
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count
+                        for bound, count in zip(BUCKETS_MS, self.counts)},
+        }
+
+
+class Timings:
+    """
+    Durations and call counts of the stages run while recording one request.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, count = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (total + seconds, count + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {name: {"ms": total * 1000, "count": count} for name, (total, count) in self.stages.items()}
+
+    def server_timing(self):
+        """
+        Returns the stages formatted as a Server-Timing header value.
+        """
+        with self._lock:
+            return ", ".join(f"{name};dur={total * 1000:.2f}" for name, (total, _) in self.stages.items())
+
+
+def add(name, seconds):
+    """
+    Records a duration for a stage in the current recording and in the
+    process-wide histograms.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+    with _histograms_lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram()
+        _histograms[name].add(seconds)
+
+
+@contextmanager
+def _stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start)
+
+
+def stage(name):
+    """
+    Context manager timing the enclosed block as stage `name`.
+    """
+    if not _enabled:
+        return _noop
+    return _stage(name)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as stage `name`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                add(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def record():
+    """
+    Collects the stages run in the enclosed block, including those run in
+    threads started with a copy of the current context, and yields the
+    Timings.
+    """
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def histograms():
+    """
+    Returns a snapshot of the process-wide stage histograms.
+    """
+    with _histograms_lock:
+        return {name: histogram.as_dict() for name, histogram in _histograms.items()}
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
@@ -0,0 +1,145 @@
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from profile_db import write_json_atomic
+from vtp_to_svg import get_dimensions, poly_data_points, read_vtp
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def read_profile(vtp_file_path):
+    """
+    Reads the profile of one simulation output.
+
+    Returns:
+        tuple: ((n, 2) float64 point array, depth), the depth being the
+        y extent of the bounds as get_dimensions computes it.
+    """
+    poly_data = read_vtp(vtp_file_path)
+    points = poly_data_points(poly_data)
+    if len(points) == 0:
+        return np.zeros((0, 2)), 0.0
+    return points[:, :2].astype(np.float64), get_dimensions(poly_data)[1]
+
+
+def find_vtp_files(paths):
+    """
+    Expands directories into the .vtp files they contain, in sorted order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.vtp"))))
+        else:
+            files.append(path)
+    return files
+
+
+def profile_key(vtp_file_path, manifest=None):
+    """
+    Returns the profile DB key of a simulation output. The manifest maps file
+    names to keys such as "3_0.5_0_0_4"; without an entry the file's stem is
+    used as the key.
+    """
+    name = os.path.basename(vtp_file_path)
+    if manifest and name in manifest:
+        return manifest[name]
+    return os.path.splitext(name)[0]
+
+
+def _ingest_one(vtp_file_path):
+    points, depth = read_profile(vtp_file_path)
+    return vtp_file_path, points, depth
+
+
+def journal_path(db_path):
+    return db_path + JOURNAL_SUFFIX
+
+
+def _read_journal(path):
+    """
+    Yields the (key, entry) records of an ingest journal. A record cut off
+    by an interrupted write is ignored.
+    """
+    with open(path) as f:
+        for line in f:
+            try:
+                key, entry = json.loads(line)
+            except ValueError:
+                continue
+            yield key, entry
+
+
+def _open_journal(db_path):
+    journal = open(journal_path(db_path), "a+")
+    # Start on a new line after a record cut off by an interrupted ingest
+    if journal.tell():
+        journal.seek(journal.tell() - 1)
+        if journal.read(1) != "\n":
+            journal.write("\n")
+    return journal
+
+
+def fold_journal(db_path):
+    """
+    Merges the ingest journal of db_path into the DB, rewriting it once,
+    and removes the journal. Does nothing without a journal.
+    """
+    path = journal_path(db_path)
+    if not os.path.exists(path):
+        return
+    data = {}
+    if os.path.exists(db_path):
+        with open(db_path) as f:
+            data = json.load(f)
+    data.update(_read_journal(path))
+    write_json_atomic(db_path, data)
+    os.remove(path)
+
+
+def ingest_vtp_files(paths, db_path, manifest=None, workers=None, flush_every=50, progress=None):
+    """
+    Reads simulation outputs in parallel and merges them into a JSON profile DB.
+
+    Files are parsed across worker processes and each result is appended to
+    a journal next to the DB, flushed to disk every flush_every files. The
+    journal is folded into the DB once at the end, so an ingest costs one
+    rewrite of the DB however many files it reads. An interrupted ingest
+    keeps everything flushed so far: its journal is folded in by the next
+    ingest, or by fold_journal.
+
+    Args:
+        paths (list): .vtp files or directories containing them.
+        db_path (str): JSON profile DB to create or update.
+        manifest (dict): Optional mapping of file names to profile keys.
+        workers (int): Number of worker processes, defaults to the CPU count.
+        flush_every (int): Number of files between journal flushes.
+        progress (callable): Called with (done, total, key) after each file.
+
+    Returns:
+        int: Number of profiles ingested.
+    """
+    files = find_vtp_files(paths)
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, _open_journal(db_path) as journal:
+        futures = [executor.submit(_ingest_one, vtp_file_path) for vtp_file_path in files]
+        for future in as_completed(futures):
+            vtp_file_path, points, depth = future.result()
+            key = profile_key(vtp_file_path, manifest)
+            # Same [x, y, 0.0] layout as the existing profile DBs
+            triples = np.column_stack([points, np.zeros(len(points))])
+            journal.write(json.dumps([key, {"points": triples.tolist(), "depth": depth}]) + "\n")
+            done += 1
+            if progress is not None:
+                progress(done, len(files), key)
+            if done % flush_every == 0:
+                journal.flush()
+                os.fsync(journal.fileno())
+
+    fold_journal(db_path)
+    return done
@@ -1,9 +1,20 @@
-import vtk
+import gzip
+import logging
+import math
+from typing import TYPE_CHECKING
+
 import fft_reconstruct
 import numpy as np
+import timing
+from curve_resample import resample_arc_length
+
+if TYPE_CHECKING:
+    import vtk
+
+logger = logging.getLogger(__name__)
 
 
-def get_dimensions(poly_data: vtk.vtkPolyData) -> tuple[float, float]:
+def get_dimensions(poly_data: "vtk.vtkPolyData") -> tuple[float, float]:
     """
     Calculates the vertical distance between the min and max y-coordinates of all points.
 
@@ -29,176 +40,137 @@ def get_dimensions(poly_data: vtk.vtkPolyData) -> tuple[float, float]:
     return max_x - min_x, max_y - min_y
 
 
-def get_vtp_points(vtp_file_path: str) -> list[tuple[float, float]]:
-    print(f"Reading VTP file from: {vtp_file_path}")
+def read_vtp(vtp_file_path: str) -> "vtk.vtkPolyData":
+    """
+    Reads a VTP file and returns its polygonal data.
+    """
+    # VTK is slow to import and only needed for reading simulation output
+    import vtk
 
     # Create a VTK XML PolyData reader
     reader = vtk.vtkXMLPolyDataReader()
     reader.SetFileName(vtp_file_path)
     reader.Update()
+    return reader.GetOutput()
+
+
+def poly_data_points(poly_data: "vtk.vtkPolyData") -> np.ndarray:
+    """
+    Returns the (n, 3) point array of the polydata as a zero-copy NumPy view
+    of the VTK buffer.
+    """
+    from vtk.util.numpy_support import vtk_to_numpy
 
-    # Get the polygonal data from the reader
-    poly_data = reader.GetOutput()
     points = poly_data.GetPoints()
+    if points is None or points.GetNumberOfPoints() == 0:
+        return np.zeros((0, 3))
+    return vtk_to_numpy(points.GetData())
 
-    num_points = points.GetNumberOfPoints()
 
-    if num_points == 0:
-        print("VTP file contains no points. No SVG will be generated.")
-        return
+def get_vtp_points(vtp_file_path: str) -> np.ndarray:
+    logger.debug("reading VTP file %s", vtp_file_path)
 
-    print(f"Found {num_points} points.")
+    points = poly_data_points(read_vtp(vtp_file_path))
 
-    svg_points = []
+    if len(points) == 0:
+        logger.warning("%s contains no points, no SVG will be generated", vtp_file_path)
+        return
 
-    # Iterate through the points and add a circle element for each
-    for i in range(num_points):
-        point = points.GetPoint(i)
-        svg_points.append((point[0], point[1]))
-    return svg_points
+    logger.debug("found %d points", len(points))
+    return points[:, :2]
 
 
-def points_to_svg(points: list[tuple[float, float]], svg_file_path: str) -> None:
+def svg_content(points, precision: int = 4) -> str:
     """
-    Converts a list of points to an SVG file, plotting only the points as circles.
+    Builds an SVG document drawing the points as a single polyline.
 
     Args:
-        points (list): A list of tuples or lists representing the points (x, y).
-        svg_file_path (str): The path for the output .svg file.
+        points: A (n, 2) array, or a list of (x, y) tuples or lists.
+        precision (int): Number of decimals written for each coordinate.
+
+    Returns:
+        str: The SVG document.
     """
-    if not points:
-        print("No points provided. No SVG will be generated.")
-        return
+    points = np.asarray(points, dtype=np.float64)[:, :2]
 
     # Determine the bounding box to set the SVG viewBox
-    
-    extracted_points = list(zip(*points))
-    x_coords = extracted_points[0]
-    y_coords = extracted_points[1]
-    x_min, x_max = np.min(x_coords), np.max(x_coords)
-    y_min, y_max = np.min(y_coords), np.max(y_coords)
+    x_min, y_min = points.min(axis=0)
+    x_max, y_max = points.max(axis=0)
     width = x_max - x_min
     height = y_max - y_min
 
     # Use padding to ensure points on the edge are visible
     padding = max(width, height) * 0.05
-    viewBox_x = x_min - padding
-    viewBox_y = y_min - padding
-    viewBox_width = width + 2 * padding
-    viewBox_height = height + 2 * padding
-
-    # A small fixed radius for the points
-    point_radius = max(width, height) * 0.005
-    if point_radius == 0:
-        point_radius = 1  # Fallback for single-point or zero-bound data
-
-    print(f"Found {len(points)} points.")
-
-    # Start building the SVG content string
-    svg_content = f"""
-<svg xmlns="http://www.w3.org/2000/svg"
-     viewBox="{viewBox_x} {viewBox_y} {viewBox_width} {viewBox_height}"
-     width="800" height="600"
-     preserveAspectRatio="xMidYMid meet">
-"""
-
-    # Iterate through the points and add a circle element for each
-    for point in points:
-        svg_content += f"""
-  <circle cx="{point[0]}" cy="{point[1]}" r="{point_radius}"
-          fill="black" stroke="none" />
-"""
-
-    # Close the SVG tag
-    svg_content += """
-</svg>
-"""
-
-    print("Writing SVG file...")
-    # Write the complete SVG string to the output file
-    with open(svg_file_path, "w") as f:
-        f.write(svg_content)
-
-    print(f"Successfully created SVG file: {svg_file_path}")
-
-
-def vtp_to_svg(vtp_file_path: str, svg_file_path: str) -> tuple[float, list[tuple[float, float]]]:
+    view_box = (x_min - padding, y_min - padding, width + 2 * padding, height + 2 * padding)
+
+    # Same footprint as the former per-point circles of radius max(w, h) * 0.005
+    stroke_width = max(width, height) * 0.01
+    if stroke_width == 0:
+        stroke_width = 2  # Fallback for single-point or zero-bound data
+
+    number = f"%.{precision}f"
+    view_box = " ".join([number] * 4) % view_box
+    coordinates = " ".join([f"{number},{number}"] * len(points)) % tuple(points.ravel())
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{view_box}" '
+        'width="800" height="600" preserveAspectRatio="xMidYMid meet">\n'
+        f'<polyline fill="none" stroke="black" stroke-width="{number % stroke_width}" '
+        'stroke-linecap="round" stroke-linejoin="round" '
+        f'points="{coordinates}"/>\n'
+        '</svg>\n'
+    )
+
+
+@timing.timed("svg")
+def points_to_svg(points, svg_file_path: str | None = None, precision: int = 4,
+                  compress: bool | None = None) -> bytes | None:
+    """
+    Converts a list of points to an SVG file, plotting the points as one polyline.
+
+    Args:
+        points: A (n, 2) array, or a list of tuples or lists representing the points (x, y).
+        svg_file_path (str): The path for the output file. When None the
+            document is returned instead of written.
+        precision (int): Number of decimals written for each coordinate.
+        compress (bool): Gzip the output (svgz). Defaults to True when
+            svg_file_path ends with .svgz.
+
+    Returns:
+        bytes: The SVG document when svg_file_path is None.
+    """
+    if points is None or len(points) == 0:
+        return None
+
+    if compress is None:
+        compress = svg_file_path is not None and svg_file_path.endswith(".svgz")
+
+    content = svg_content(points, precision).encode()
+    if compress:
+        content = gzip.compress(content, mtime=0)
+
+    if svg_file_path is None:
+        return content
+    with open(svg_file_path, "wb") as f:
+        f.write(content)
+
+
+def vtp_to_svg(vtp_file_path: str, svg_file_path: str) -> tuple[float, np.ndarray]:
     """
     Parses a VTP file and converts its points data to an SVG file,
-    plotting only the points as circles.
+    plotting the points as one polyline.
 
     Args:
         vtp_file_path (str): The path to the input .vtp file.
         svg_file_path (str): The path for the output .svg file.
     """
-    print(f"Reading VTP file from: {vtp_file_path}")
-
-    # Create a VTK XML PolyData reader
-    reader = vtk.vtkXMLPolyDataReader()
-    reader.SetFileName(vtp_file_path)
-    reader.Update()
-
-    # Get the polygonal data from the reader
-    poly_data = reader.GetOutput()
+    poly_data = read_vtp(vtp_file_path)
     y_distance = get_dimensions(poly_data)[1]
-    points = poly_data.GetPoints()
+    svg_points = poly_data_points(poly_data)
 
-    num_points = points.GetNumberOfPoints()
-
-    if num_points == 0:
-        print("VTP file contains no points. No SVG will be generated.")
+    if len(svg_points) == 0:
         return
 
-    # Determine the bounding box to set the SVG viewBox
-    bounds = poly_data.GetBounds()
-    x_min, x_max, y_min, y_max = bounds[0], bounds[1], bounds[2], bounds[3]
-    width = x_max - x_min
-    height = y_max - y_min
-
-    # Use padding to ensure points on the edge are visible
-    padding = max(width, height) * 0.05
-    viewBox_x = x_min - padding
-    viewBox_y = y_min - padding
-    viewBox_width = width + 2 * padding
-    viewBox_height = height + 2 * padding
-
-    # A small fixed radius for the points
-    point_radius = max(width, height) * 0.005
-    if point_radius == 0:
-        point_radius = 1  # Fallback for single-point or zero-bound data
-
-    print(f"Found {num_points} points.")
-    svg_points = []
-
-    # Start building the SVG content string
-    # We use a viewBox to make the SVG scalable
-    svg_content = f"""
-<svg xmlns="http://www.w3.org/2000/svg"
-     viewBox="{viewBox_x} {viewBox_y} {viewBox_width} {viewBox_height}"
-     width="800" height="600"
-     preserveAspectRatio="xMidYMid meet">
-"""
-
-    # Iterate through the points and add a circle element for each
-    for i in range(num_points):
-        point = points.GetPoint(i)
-        svg_points.append(point)
-        # VTK uses (x, y, z), but SVG is 2D, so we use (x, y)
-        svg_content += f"""
-  <circle cx="{point[0]}" cy="{point[1]}" r="{point_radius}"
-          fill="black" stroke="none" />
-"""
-
-    # Close the SVG tag
-    svg_content += """
-</svg>
-"""
-    print("Writing SVG file...")
-    # Write the complete SVG string to the output file
-    with open(svg_file_path, "w") as f:
-        f.write(svg_content)
-
-    print(f"Successfully converted VTP to SVG. Output file: {svg_file_path}")
+    points_to_svg(svg_points, svg_file_path)
     return y_distance, svg_points
 
 
@@ -207,44 +179,39 @@ def intermediate_points_generation(points1, points2, weight):
     Generates intermediate points between two sets of points based on a weight.
 
     Args:
-        points1 (list): First set of points.
-        points2 (list): Second set of points.
+        points1 (np.ndarray): First set of points, shape (n, 2).
+        points2 (np.ndarray): Second set of points, shape (m, 2).
         weight (float): Weight for interpolation.
 
     Returns:
-        list: List of interpolated points.
+        np.ndarray: The interpolated points, shape (390, 2).
     """
-    # points1 = smoothing(points1, iterations=10)
-    # points2 = smoothing(points2, iterations=10)
-
-    if (len(points1) < len(points2)):
-        temp = points1
-        points1 = points2
-        points2 = temp
-
     if len(points1) == 0 or len(points2) == 0:
-        print("One of the VTP files contains no points. No SVG will be generated.")
+        logger.warning("one of the VTP files contains no points, no SVG will be generated")
         return
 
-    x1 = np.array([points1[i][0] for i in range(len(points1))])
-    y1 = np.array([points1[i][1] for i in range(len(points1))])
-    x2 = np.array([points2[i][0] if i < len(points2)
-                  else points2[-1][0] for i in range(len(points1))])
-    y2 = np.array([points2[i][1] if i < len(points2)
-                  else points2[-1][1] for i in range(len(points1))])
+    points1 = np.asarray(points1, dtype=np.float64)[:, :2]
+    points2 = np.asarray(points2, dtype=np.float64)[:, :2]
+    if len(points1) != len(points2):
+        # Curves from the binary store are already aligned, raw ones are
+        # resampled along arc length to the longer curve's point count
+        length = max(len(points1), len(points2))
+        points1 = resample_arc_length(points1, length)
+        points2 = resample_arc_length(points2, length)
 
-    x3, y3 = fft_reconstruct.intermeidate_curve(x1, y1, x2, y2, weight)
-    new_points = [(x3[i], y3[i]) for i in range(len(x3))]
-    new_points = smoothing(new_points, iterations=10)
-    return new_points
+    x3, y3 = fft_reconstruct.intermeidate_curve(points1[:, 0], points1[:, 1], points2[:, 0], points2[:, 1], weight)
+    return smoothing(np.column_stack([x3, y3]), iterations=10)
 
 
 def intermediate_svg_generation(vtp_file_path_1, vtp_file_path_2, weight, svg_file_path):
     """
-    Reads a VTP file and generates an SVG file with the points plotted as circles.
+    Reads two VTP files, interpolates their points with the given weight
+    and writes the smoothed result to an SVG file as one polyline.
 
     Args:
-        vtp_file_path (str): The path to the input .vtp file.
+        vtp_file_path_1 (str): The path to the first input .vtp file.
+        vtp_file_path_2 (str): The path to the second input .vtp file.
+        weight (float): Weight for interpolation.
         svg_file_path (str): The path for the output .svg file.
     """
 
@@ -256,28 +223,86 @@ def intermediate_svg_generation(vtp_file_path_1, vtp_file_path_2, weight, svg_fi
     points_to_svg(new_points, svg_file_path)
 
 
+def binomial_kernel(iterations):
+    """
+    Returns the weights of `iterations` passes of neighbour averaging, the
+    binomial coefficients of that order divided by 2**iterations.
+    """
+    return np.array([math.comb(iterations, i) for i in range(iterations + 1)]) / 2.0**iterations
+
+
+def _binomial_filter(a, iterations, axis):
+    a = np.moveaxis(np.asarray(a), axis, 0)
+    length = max(len(a) - iterations, 0)
+    kernel = binomial_kernel(iterations)
+    # 'valid' convolution with the kernel, one shifted slice per weight
+    out = kernel[0] * a[:length]
+    for i in range(1, iterations + 1):
+        out = out + kernel[i] * a[i:i + length]
+    return np.moveaxis(out, 0, axis)
+
+
+@timing.timed("smoothing")
 def smoothing(points, iterations=3):
-    for _ in range(iterations):
-        points_new = [(0.5*(points[i][0] + points[i+1][0]), 0.5 *
-                       (points[i][1] + points[i+1][1])) for i in range(len(points) - 1)]
-        points = points_new
-    return points
+    """
+    Averages neighbouring points `iterations` times in a single convolution.
+
+    Args:
+        points (np.ndarray): Points of the curve, shape (n, 2).
+        iterations (int): Number of averaging passes.
+
+    Returns:
+        np.ndarray: The smoothed points, shape (n - iterations, 2).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim != 2:
+        points = points.reshape(-1, 2)
+    return _binomial_filter(points[:, :2], iterations, axis=0)
+
+
+def smoothing_array(z, iterations=3):
+    """
+    Applies smoothing along the last axis of an array, e.g. the complex
+    samples of many curves at once.
+    """
+    return _binomial_filter(z, iterations, axis=-1)
 
 
 def svg_generation(vtp_file_path, svg_file_path):
 
     points = get_vtp_points(vtp_file_path)
-    x = np.array([points[i][0] for i in range(len(points))])
-    y = np.array([points[i][1] for i in range(len(points))])
-    freqs, coeffs, z = fft_reconstruct.fourier_curve_reconstruction(x, y)
-    new_points = [(z[i].real, z[i].imag) for i in range(len(z) - 1)]
+    freqs, coeffs, z = fft_reconstruct.fourier_curve_reconstruction(points[:, 0], points[:, 1])
+    new_points = np.column_stack([z.real[:-1], z.imag[:-1]])
     new_points = smoothing(new_points, iterations=10)
     points_to_svg(new_points, svg_file_path)
 
 
-def create_curve(p1, p2, p3, p4, w1, w2, svg_path):
+def blend_points(p1, p2, p3, p4, w1, w2):
+    """
+    Blends four curves pairwise, first along w1 and then along w2.
+    """
     p5 = intermediate_points_generation(p1, p2, w1)
     p6 = intermediate_points_generation(p3, p4, w1)
-    p7 = intermediate_points_generation(p5, p6, w2)
+    return intermediate_points_generation(p5, p6, w2)
+
+
+def create_curve(p1, p2, p3, p4, w1, w2, svg_path):
+    p7 = blend_points(p1, p2, p3, p4, w1, w2)
     points_to_svg(p7, svg_path)
-    # points_to_svg(p1, svg_path)
\ No newline at end of file
+    # points_to_svg(p1, svg_path)
+
+
+def blend_spectra(spectra, keys, weights):
+    """
+    Blends library curves from their precomputed Fourier coefficients.
+
+    Args:
+        spectra (SpectralLibrary): Coefficients of the library curves.
+        keys (list): Keys of the curves to blend.
+        weights (list): Blend weight of each curve.
+
+    Returns:
+        np.ndarray: The blended points, shape (390, 2).
+    """
+    z = spectra.blend_curve(keys, weights)
+    return smoothing(np.column_stack([z.real, z.imag]), iterations=10)
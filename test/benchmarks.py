@@ -0,0 +1,165 @@
+"""
+Benchmarks the hot paths of the profile pipeline against the bundled data/
+files and compares the results with a saved baseline.
+
+Every benchmark is warmed up once, then timed in batches long enough to
+measure reliably; the fastest batch gives the time per call.
+
+Usage (from the repository root):
+    python test/benchmarks.py --save              # record the baseline
+    python test/benchmarks.py                     # compare with the baseline
+    python test/benchmarks.py --threshold 0.5 smoothing create_curve
+
+Exits with status 1 when a benchmark is slower than its baseline by more
+than the threshold (0.25 = 25% by default).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "data")
+DEFAULT_BASELINE = os.path.join(ROOT, "test", "benchmark_baseline.json")
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "etchingsim"))
+
+import numpy as np  # noqa: E402
+
+import fft_reconstruct  # noqa: E402
+from etchingsim import etching_data_1, load_profile_db  # noqa: E402
+from vtp_to_svg import create_curve, intermediate_points_generation, points_to_svg, smoothing  # noqa: E402
+
+CURVE_KEYS = ("3_0.5_0_0_3", "4_0.5_0_0_3", "3_1.5_0_0_3", "4_1.5_0_0_3")
+
+DASHBOARD_PARAMS = {"no_deposition": "on", "start_range": 1000, "end_range": 1100, "neutral_particle_flux": 500}
+
+
+def profile_benchmarks(tmpdir):
+    data = load_profile_db(os.path.join(DATA_DIR, "etching_only_db.json"))
+    p1, p2, p3, p4 = [np.asarray(data[key]["points"])[:, :2] for key in CURVE_KEYS]
+    z = p1[:, 0] + 1j*p1[:, 1]
+    freqs = fft_reconstruct.default_frequencies(len(z))
+    coeffs = fft_reconstruct.dft_at_frequencies(z, freqs)
+    blended = intermediate_points_generation(p1, p2, 0.3)
+    svg_path = os.path.join(tmpdir, "profile.svg")
+    csv_path = os.path.join(DATA_DIR, "etchingdata.csv")
+
+    return {
+        "dft_at_frequencies": lambda: fft_reconstruct.dft_at_frequencies(z, freqs),
+        "reconstruct_curve": lambda: fft_reconstruct.reconstruct_curve(coeffs, freqs),
+        "smoothing": lambda: smoothing(blended, iterations=10),
+        "intermediate_points_generation": lambda: intermediate_points_generation(p1, p2, 0.3),
+        "create_curve": lambda: create_curve(p1, p2, p3, p4, 0.3, 0.6, svg_path),
+        "points_to_svg": lambda: points_to_svg(blended),
+        "etching_data_1": lambda: etching_data_1(csv_path),
+    }
+
+
+def dashboard_benchmarks(tmpdir):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "etchingdashboard.settings")
+    import django
+    from django.conf import settings
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    render_dir = os.path.join(tmpdir, "renders")
+    settings.RENDER_CACHE_DIR = render_dir
+    client = Client()
+
+    def uncached():
+        # Drop the rendered images so the profile is generated again
+        shutil.rmtree(render_dir, ignore_errors=True)
+        os.makedirs(render_dir)
+        return client.post("/", DASHBOARD_PARAMS)
+
+    return {
+        "dashboard_view": uncached,
+        "dashboard_view (cached render)": lambda: client.post("/", DASHBOARD_PARAMS),
+    }
+
+
+def time_call(fn, repeat=5, min_batch_time=0.05):
+    """
+    Returns the fastest time per call of fn over repeat batches.
+    """
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_batch_time or number >= 10**6:
+            break
+        number *= 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the results next to the baseline and returns the names of the
+    benchmarks that regressed by more than threshold.
+    """
+    regressions = []
+    for name, seconds in results.items():
+        line = f"{name:32s} {seconds * 1e3:10.3f} ms"
+        if name in baseline:
+            ratio = seconds / baseline[name]
+            line += f"   baseline {baseline[name] * 1e3:10.3f} ms   x{ratio:.2f}"
+            if ratio > 1 + threshold:
+                regressions.append(name)
+                line += "   REGRESSION"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, all by default.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown relative to the baseline, as a fraction.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        benchmarks = {**profile_benchmarks(tmpdir), **dashboard_benchmarks(tmpdir)}
+        unknown = set(args.names) - set(benchmarks)
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+        results = {name: time_call(fn, args.repeat) for name, fn in benchmarks.items()
+                   if not args.names or name in args.names}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "results": {**baseline, **results}}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
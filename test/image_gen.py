@@ -1,15 +1,16 @@
+import os
 import sys
-sys.path.append('../etchingsim/')
-from etchingsim import generate_etching_profile
-import json
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../etchingsim/'))
+from etchingsim import generate_etching_profile, load_profile_db
 
-average_ion_flux = 3000
-n_cycles = 70
-neutral_particle_flux = 1000
-ion_deposition_flux = 3
-neu_deposition_flux = 2
+average_ion_flux = 3400
+n_cycles = 3
+neutral_particle_flux = 800
+ion_deposition_flux = 0
+neu_deposition_flux = 0
+etching_limits = [3, 4]
 output_svg_file = "test_svg.svg"
 
-data = json.load(open("../data/etching_db_new.json"))
+data = load_profile_db(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/etching_only_db.json"))
 
-generate_etching_profile(average_ion_flux/1000, float(neutral_particle_flux)/1000, ion_deposition_flux, neu_deposition_flux, n_cycles, data, output_svg_file)
\ No newline at end of file
+generate_etching_profile(average_ion_flux/1000, float(neutral_particle_flux)/1000, ion_deposition_flux, neu_deposition_flux, n_cycles, data, output_svg_file, etching_limits)
@@ -0,0 +1,91 @@
+"""
+Measures cold-start cost: the import time of etchingsim and the time to
+boot Django with the dashboard URLconf loaded. Each measurement runs in a
+fresh interpreter so nothing is cached between repeats.
+
+Usage (from the repository root):
+    python test/startup_benchmark.py [--repeat 5] [--importtime]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_ETCHINGSIM = """
+import sys, time
+sys.path.append({utils_dir!r})
+start = time.perf_counter()
+import etchingsim
+print(time.perf_counter() - start)
+"""
+
+BOOT_DJANGO = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'etchingdashboard.settings')
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import resolve
+get_wsgi_application()
+resolve('/')
+print(time.perf_counter() - start)
+"""
+
+HEAVY_MODULES = ("vtk", "matplotlib", "pandas")
+
+
+def run(code, *flags):
+    result = subprocess.run([sys.executable, *flags, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return result
+
+
+def measure(code, repeat):
+    return [float(run(code).stdout.strip().splitlines()[-1]) for _ in range(repeat)]
+
+
+def heavy_imports():
+    code = IMPORT_ETCHINGSIM.format(utils_dir=os.path.join(ROOT, "etchingsim"))
+    code += f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    return run(code).stdout.strip().splitlines()[-1]
+
+
+def importtime_top(n=15):
+    code = IMPORT_ETCHINGSIM.format(utils_dir=os.path.join(ROOT, "etchingsim"))
+    stderr = run(code, "-X", "importtime").stderr
+    rows = []
+    for line in stderr.splitlines()[1:]:
+        parts = line.split("|")
+        if len(parts) == 3:
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true",
+                        help="Also list the slowest imports (cumulative, in microseconds).")
+    args = parser.parse_args()
+
+    results = {
+        "import etchingsim": measure(IMPORT_ETCHINGSIM.format(utils_dir=os.path.join(ROOT, "etchingsim")),
+                                     args.repeat),
+        "django boot": measure(BOOT_DJANGO.format(root=ROOT), args.repeat),
+    }
+    for name, times in results.items():
+        print(f"{name:20s} median {statistics.median(times) * 1000:8.1f} ms"
+              f"  min {min(times) * 1000:8.1f} ms  ({args.repeat} runs)")
+    print(f"heavy modules loaded by etchingsim: {heavy_imports()}")
+
+    if args.importtime:
+        print("\nslowest imports (cumulative us):")
+        for cumulative, name in importtime_top():
+            print(f"{cumulative:10d}  {name}")
+
+
+if __name__ == "__main__":
+    main()